@@ -12,16 +12,31 @@ adapted by zdpaul (paul.zodl@uni-konstanz.de)
 import os
 import re
 import argparse
+import atexit
 import subprocess
 import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 from sys import stdin, stdout
 
 from nltk.corpus.util import LazyCorpusLoader
 from nltk.data import path as nltk_path
 
 from lib import depender
-from lib.reader import PPCHYFormatReader, IndexedCorpusTree
+from lib.cache import BuildCache, TreeCache, ParsedTreeCache
+from lib.reader import PPCHYFormatReader, IndexedCorpusTree, read_trees
 from lib.tools import fix_IcePaHC_tree_errors, tagged_corpus
+from lib.writer import ConllUWriter, sentence_lines
+
+# words marking the end of a sentence, clauses are joined until one is found
+END_OF_SENTENCE = {".", ":", "?", "!", "kafli", '"'}
+
+# (TAG token) leaf of a tree in its raw text
+TREE_LEAF = re.compile(r"\(([^\s()]+) ([^\s()]+)\)")
+
+# (ID ...) node of a tree in its raw text
+TREE_ID = re.compile(r"\(ID [^\s()]+\)")
+
 
 def run_pre(corpus_path):
     """Run preprocessing shell script for the given corpus."""
@@ -48,6 +63,528 @@ def load_corpus(name):
         )
     return corpus_loader
 
+def parse_psd_tree(psd):
+    """
+    Parses the raw text of a single tree in --NO_CORPUS mode, returning a
+    list with the tree (see ParsedTreeCache)
+    """
+    return [IndexedCorpusTree.fromstring(psd, trim_id_tag=True, preprocess=True)]
+
+
+def psd_blocks(input_path):
+    """
+    Yields the raw text of every tree of a .psd file in --NO_CORPUS mode
+    """
+    with open(input_path) as infile:
+        yield from read_trees(infile)
+
+
+def convert_psd_tree(c, psd):
+    """
+    Converts the raw text or the parsed tree of a single tree in --NO_CORPUS
+    mode, where every tree is a sentence of its own.
+
+    Returns:
+        str: CoNLL-U of the sentence, following its sent_id line
+    """
+    dep = c.create_dependency_graph(psd)
+    return (
+        str(dep.original_ID_plain_text())
+        + "\n"
+        + str(dep.plain_text())
+        + "\n"
+        + c.add_space_after(dep).to_conllU()
+    )
+
+
+def convert_psd_file(input_path, output_path=None, post_process=False, use_cache=False):
+    """
+    Converts a single .psd file tree by tree, without the corpus reader.
+    Used by the --NO_CORPUS mode, possibly inside a worker process.
+
+    Args:
+        input_path (str): path to the .psd file, stdin if None
+        output_path (str): path to the .conllu output file, stdout if None
+        post_process (bool): run postprocessing script on the output file
+        use_cache (bool): reuse the CoNLL-U of unchanged trees from the tree
+            cache and the parsed trees from the parsed tree cache, see
+            lib/cache.py
+
+    Returns:
+        int: number of sentences written
+    """
+    c = depender.Converter()
+    cache = TreeCache() if use_cache else None
+    parsed = (
+        ParsedTreeCache(
+            input_path, parse_psd_tree, "N", partial(psd_blocks, input_path)
+        )
+        if use_cache and input_path
+        else None
+    )
+
+    file_sents = 0
+
+    file_id = re.sub(r"\.psd", "", os.path.basename(input_path))
+
+    try:
+        with open(input_path) if input_path else stdin as infile, open(
+            output_path, "w"
+        ) if output_path else stdout as outfile, ConllUWriter(
+            outfile, flush_size=None if output_path else 0
+        ) as writer:
+            # trees read one at a time from the file
+            for psd in read_trees(infile):
+                if cache:
+                    key = cache.sentence_key("N", [cache.tree_key(psd)])
+                    body = cache.sentence(key)
+                    if body is None:
+                        body = convert_psd_tree(
+                            c, parsed.parse_block(psd)[0] if parsed else psd
+                        )
+                        cache.put_sentence(key, body)
+                else:
+                    body = convert_psd_tree(c, psd)
+
+                writer.write(sentence_id_line(file_id, file_sents + 1))
+                writer.write(body)
+
+                if not output_path:
+                    input()
+                file_sents += 1
+    finally:
+        if cache:
+            cache.close()
+        if parsed:
+            parsed.save()
+
+    if output_path and post_process:
+        run_post_file(output_path)
+
+    return file_sents
+
+
+def sentence_id_line(file_id, sent_num):
+    """
+    Returns the '# sent_id = ...' comment line for a sentence, numbered by
+    its position in the file.
+    """
+    sent_id = re.sub(r"\.psd", "", file_id).upper() + ",." + str(sent_num)
+    sent_id = re.sub(r"/", "_", sent_id)
+    return "# sent_id = " + sent_id + "\n"
+
+
+def sentence_body(dep):
+    """
+    Returns the CoNLL-U of a finished sentence, following its sent_id line:
+    the original treebank ID(s), the sentence text and the token lines.
+    """
+    # sent ID from original treebank, sentence text, sentence CoNLLU
+    return "".join(sentence_lines(dep))
+
+
+def convert_tree(c, tree, num):
+    """
+    Converts a single tree of a corpus file and checks whether it ends a
+    sentence, by the sentence final punctuation and specific words (e.g.
+    'kafli') or a graph with only the root node.
+
+    Args:
+        c (Converter): converter used for the tree
+        tree (IndexedCorpusTree): the parsed tree
+        num (int): position of the tree in its file, used for naming trees
+            without an ID
+
+    Returns:
+        tuple: (dep, ends) the dependency graph and whether it ends a sentence
+    """
+    # Catch error in corpus where ? token is missing (IcePaHC specific)
+    tree = fix_IcePaHC_tree_errors(tree)
+    # Tree static variable defined, code nodes and some traces removed
+    TREE = tree.remove_nodes(tags=["CODE"], trace=True)
+
+    # Tree ID created if missing
+    if not TREE.corpus_id:
+        TREE.corpus_id = "ID_missing_" + str(num)
+
+    # conversion happens here
+    dep = c.create_dependency_graph(TREE)
+
+    # last token of the graph, by the largest address as addresses are not
+    # contiguous after tokens are deleted
+    last = dep.get_by_address(max(a for a in dep.nodes if a != "_"))
+    return dep, last["word"] in END_OF_SENTENCE or len(dep.nodes) == 1
+
+
+def finish_sentence(c, deps):
+    """
+    Returns the dependency graph of a finished sentence from the graphs of
+    its clauses, joining them into a single graph if needed
+    """
+    if len(deps) == 1:
+        # the sentence is complete already, add NoSpaceAfter to misc column
+        return c.add_space_after(deps[0])
+    # dependency graphs joined into single graph
+    dep = c.add_space_after(c.join_graphs(deps))
+    return c.add_space_after(dep)
+
+
+def join_sentences(c, trees, first_num=1):
+    """
+    Converts trees one by one and joins the dependency graphs of clauses
+    into whole sentences, checking the sentence final punctuation and
+    specific words (e.g. 'kafli').
+
+    Args:
+        c (Converter): converter used for the trees
+        trees (iterable): IndexedCorpusTree objects in file order
+        first_num (int): position of the first tree in its file, used for
+            naming trees without an ID
+
+    Yields:
+        tuple: (dep, n) for every finished sentence, where n is the number of
+            trees joined into dep. Trees left at the end without sentence
+            final punctuation are yielded as (None, n).
+    """
+    to_join = []  # list for use in joining d.graphs into whole sentences
+
+    for num, tree in enumerate(trees, start=first_num):
+        dep, ends = convert_tree(c, tree, num)
+        # incomplete sentences (single clauses) are kept for joining
+        to_join.append(dep)
+        if ends:
+            yield finish_sentence(c, to_join), len(to_join)
+            to_join = []
+
+    if to_join:
+        yield None, len(to_join)
+
+
+def file_sentences(c, CORPUS, blocks, cache=None, first_num=1, parsed=None):
+    """
+    Converts the raw trees of a corpus file into sentences, see
+    join_sentences(). With a tree cache, trees are only parsed and converted
+    if they have not been converted before, or if they belong to a sentence
+    with a changed tree, which is then converted again as a whole.
+
+    Args:
+        c (Converter): converter used for the trees
+        CORPUS (PPCHYFormatReader): corpus reader used for parsing the trees
+        blocks (iterable): raw trees in file order, see CORPUS.blocks()
+        cache (TreeCache): tree cache, or None
+        first_num (int): position of the first tree in its file
+        parsed (ParsedTreeCache): parsed trees of the file, or None
+
+    Yields:
+        tuple: (body, n) for every sentence, where body is the CoNLL-U of
+            the sentence following its sent_id line (see sentence_body()) and
+            n is the number of trees in it. Trees left at the end without
+            sentence final punctuation are yielded as (None, n).
+    """
+    parse_block = parsed.parse_block if parsed else CORPUS.parse_block
+    if cache is None:
+        trees = (tree for block in blocks for tree in parse_block(block))
+        for dep, n in join_sentences(c, trees, first_num):
+            yield (sentence_body(dep) if dep else None), n
+        return
+
+    group = []  # (num, block, dep) for the trees of the current sentence
+    keys = []
+    num = first_num - 1  # trees are numbered as in join_sentences()
+    for block in blocks:
+        # the position only matters for trees without an ID, which are named
+        # by it, so that other trees are found again after an insertion
+        if TREE_ID.search(block):
+            key = cache.tree_key(block)
+        else:
+            key = cache.tree_key(block, num + 1)
+        ends = cache.ends(key)
+        dep = None
+        if ends is None:
+            trees = parse_block(block)
+            if not trees:
+                # empty trees are skipped by the corpus reader
+                continue
+            dep, ends = convert_tree(c, trees[0], num + 1)
+            cache.put_ends(key, ends)
+        num += 1
+        group.append((num, block, dep))
+        keys.append(key)
+        if not ends:
+            continue
+
+        sent_key = cache.sentence_key("corpus", keys)
+        body = cache.sentence(sent_key)
+        if body is None:
+            deps = [
+                dep or convert_tree(c, parse_block(block)[0], tree_num)[0]
+                for tree_num, block, dep in group
+            ]
+            body = sentence_body(finish_sentence(c, deps))
+            cache.put_sentence(sent_key, body)
+        yield body, len(group)
+        group = []
+        keys = []
+
+    if group:
+        yield None, len(group)
+
+
+def corpus_output_path(file_id):
+    """
+    Returns the path of the .conllu file written for a corpus file
+    """
+    return os.path.join("../CoNLLU/ppchy/", re.sub(r"\.psd", ".conllu", file_id))
+
+
+def parsed_tree_cache(CORPUS, file_id):
+    """
+    Returns the ParsedTreeCache of a corpus file in --file and --corpus mode
+    """
+    return ParsedTreeCache(
+        str(CORPUS.abspath(file_id)),
+        CORPUS.parse_block,
+        "corpus",
+        partial(CORPUS.blocks, file_id),
+    )
+
+
+def convert_trees(CORPUS, file_id, output=False, tag_dict=None, use_cache=False):
+    """
+    Converts the trees of a single corpus file, joining clauses into
+    sentences based on punctuation. Used by the --file and --corpus modes.
+
+    Args:
+        CORPUS (PPCHYFormatReader): the corpus
+        file_id (str): corpus file ID, e.g. '1478w-letter-regensburg.psd'
+        output (bool): write to ../CoNLLU/ppchy/ instead of stdout
+        tag_dict (dict): automatic tags passed on to the Converter
+        use_cache (bool): reuse the CoNLL-U of unchanged sentences from the
+            tree cache and the parsed trees from the parsed tree cache, see
+            lib/cache.py
+
+    Returns:
+        int: number of sentences written
+    """
+    # deleted autotags and faroese
+    c = depender.Converter()
+    if tag_dict is not None:
+        # only used by a Converter with auto_tags, not part of the cache keys
+        c.set_tag_dict(tag_dict)
+    cache = TreeCache() if use_cache else None
+    parsed = parsed_tree_cache(CORPUS, file_id) if use_cache else None
+
+    file_sents = 0  # no. of sentence from current file
+
+    # path to output saved if indicated, else saved as None
+    output_path = corpus_output_path(file_id) if output else None
+
+    try:
+        with open(output_path, "w") if output else stdout as outfile, ConllUWriter(
+            outfile, flush_size=None if output else 0
+        ) as writer:
+            # open file if writing to output, else to stdout, either way
+            # written through 'writer' in below code
+            for body, _ in file_sentences(
+                c, CORPUS, CORPUS.blocks(file_id), cache, parsed=parsed
+            ):
+                if body is None:
+                    # unfinished sentence at the end of the file
+                    continue
+                writer.write(sentence_id_line(file_id, file_sents + 1))
+                writer.write(body)
+
+                if not output_path:
+                    # when writing to stdout, asks for user input (enter)
+                    input()
+                file_sents += 1  # sentence count runner incremented by 1
+    finally:
+        if cache:
+            cache.close()
+        if parsed:
+            parsed.save()
+
+    return file_sents
+
+
+def convert_corpus_file(CORPUS, file_id, output=False, use_cache=False):
+    """
+    Converts a single file of the corpus in --corpus mode, possibly inside a
+    worker process. See convert_trees().
+    """
+    tag_dict = tagged_corpus(CORPUS.tree_handles(file_id))
+    return convert_trees(CORPUS, file_id, output, tag_dict, use_cache)
+
+
+def _ends_sentence(block):
+    """
+    Guesses from the raw text of a tree whether it ends a sentence, i.e.
+    whether its last token is sentence final punctuation. Only used to
+    place chunk boundaries; the joining itself is decided on the converted
+    dependency graphs.
+    """
+    leaves = TREE_LEAF.findall(block)
+    while leaves and leaves[-1][0] == "ID":
+        leaves.pop()
+    return bool(leaves) and leaves[-1][1] in END_OF_SENTENCE
+
+
+def split_blocks(blocks, num_chunks):
+    """
+    Splits the raw trees of a file into about num_chunks chunks of similar
+    size, each ending with a tree that ends a sentence where possible.
+
+    Returns:
+        list: (start, end) index pairs into blocks
+    """
+    chunk_size = max(1, len(blocks) // num_chunks)
+    chunks = []
+    start = 0
+    for i, block in enumerate(blocks):
+        if i + 1 - start >= chunk_size and _ends_sentence(block):
+            chunks.append((start, i + 1))
+            start = i + 1
+    if start < len(blocks):
+        chunks.append((start, len(blocks)))
+    return chunks
+
+
+def _convert_chunk_worker(
+    corpus_path, corpus_name, file_id, blocks, first_num, use_cache
+):
+    """
+    Entry point for worker processes in --file mode with --jobs.
+    Parses and converts a chunk of raw trees from a file. The trees parsed
+    for the parsed tree cache are returned to the main process, which saves
+    the cache of the file once.
+
+    Returns:
+        tuple: (groups, new) where groups is (body, n) for every sentence in
+            the chunk, see file_sentences(), and new the ParsedTreeCache of
+            the newly parsed trees (see ParsedTreeCache.new_trees()), or None
+    """
+    if corpus_path not in nltk_path:
+        nltk_path.append(corpus_path)
+    CORPUS = load_corpus(corpus_name)
+    c = depender.Converter()
+    cache = TreeCache() if use_cache else None
+    parsed = parsed_tree_cache(CORPUS, file_id) if use_cache else None
+    try:
+        groups = list(file_sentences(c, CORPUS, blocks, cache, first_num, parsed))
+        return groups, parsed.new_trees() if parsed else None
+    finally:
+        if cache:
+            cache.close()
+
+
+def convert_file_parallel(
+    CORPUS, corpus_path, corpus_name, file_id, jobs, outfile, use_cache=False
+):
+    """
+    Converts a single corpus file with sentence level parallelism.
+    The trees of the file are split into chunks at (probable) sentence
+    boundaries, which are converted by worker processes. The sentences are
+    then numbered and written in file order. A sentence that runs over the
+    end of a chunk is converted again as a whole in the main process.
+    Trees without an ID are named by their position in the file, as in
+    convert_trees(). A chunk that fails in its worker is converted again in
+    the main process, and skipped with an error message if it fails there
+    too. The parsed tree cache of the file is saved once, here, with the
+    trees parsed by the workers.
+
+    Returns:
+        int: number of sentences written
+    """
+    blocks = list(CORPUS.blocks(file_id))
+    chunks = split_blocks(blocks, jobs * 4)
+    c = depender.Converter()
+    cache = TreeCache() if use_cache else None
+    parsed = parsed_tree_cache(CORPUS, file_id) if use_cache else None
+
+    file_sents = 0
+    carry = []  # block indices of a sentence started in an earlier chunk
+
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor, ConllUWriter(
+            outfile
+        ) as writer:
+            futures = [
+                executor.submit(
+                    _convert_chunk_worker,
+                    corpus_path,
+                    corpus_name,
+                    file_id,
+                    blocks[start:end],
+                    start + 1,
+                    use_cache,
+                )
+                for start, end in chunks
+            ]
+            for (start, end), future in zip(chunks, futures):
+                pos = start
+                try:
+                    groups, new = future.result()
+                    if parsed and new:
+                        parsed.merge(new)
+                except Exception as e:
+                    print(f"Error! Trees {start + 1}-{end} of {file_id} failed: {e!r}")
+                    # converted again here, with the start of a sentence carried
+                    # over from the previous chunk
+                    if carry:
+                        pos = carry[0]
+                        carry = []
+                    try:
+                        groups = list(
+                            file_sentences(
+                                c, CORPUS, blocks[pos:end], cache, pos + 1, parsed
+                            )
+                        )
+                    except Exception as e:
+                        print(
+                            f"Error! Skipping trees {pos + 1}-{end} of {file_id}: {e!r}"
+                        )
+                        continue
+                for body, n in groups:
+                    span = list(range(pos, pos + n))
+                    pos += n
+                    if carry:
+                        carry.extend(span)
+                        if body is None:
+                            continue
+                        ((body, _),) = file_sentences(
+                            c,
+                            CORPUS,
+                            [blocks[i] for i in carry],
+                            cache,
+                            carry[0] + 1,
+                            parsed,
+                        )
+                        carry = []
+                    elif body is None:
+                        carry = span
+                        continue
+                    file_sents += 1
+                    writer.write(sentence_id_line(file_id, file_sents))
+                    writer.write(body)
+    finally:
+        if cache:
+            cache.close()
+        if parsed:
+            parsed.save()
+
+    return file_sents
+
+
+def _convert_corpus_file_worker(corpus_path, corpus_name, file_id, output, use_cache):
+    """
+    Entry point for worker processes in --corpus mode with --jobs.
+    The corpus is loaded in the worker itself, as the lazy corpus loader
+    does not survive being sent between processes.
+    """
+    if corpus_path not in nltk_path:
+        nltk_path.append(corpus_path)
+    return convert_corpus_file(load_corpus(corpus_name), file_id, output, use_cache)
+
 TREE = ""
 
 def main():
@@ -99,6 +636,28 @@ def main():
     #    action="store_true",
     # )
 
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="convert all files, also those unchanged since they were last "
+        "written with --output (see lib/cache.py)",
+    )
+    parser.add_argument(
+        "--fixer_stats",
+        action="store_true",
+        help="print how often each fixer of the dependency graphs ran and "
+        "changed the graph, and the time spent in it (see lib/depender.py)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="number of worker processes for converting files in parallel "
+        "(--input and --corpus modes) or parts of a single file (--file mode), "
+        "requires --output, default is 1",
+    )
+
     input_type = parser.add_mutually_exclusive_group(required=True)
     input_type.add_argument(
         "--NO_CORPUS",
@@ -113,6 +672,13 @@ def main():
     input_mode.add_argument(
         "--ID_number", "-id", help="treebank ID number of tree to parse"
     )
+    input_mode.add_argument(
+        "--ID_range",
+        "-idr",
+        nargs=2,
+        metavar=("FIRST_ID", "LAST_ID"),
+        help="treebank ID numbers of first and last tree of a range to parse",
+    )
     input_mode.add_argument(
         "--file", "-f", help="specific treebank file to parse as whole"
     )
@@ -136,65 +702,83 @@ def main():
         if file_id[-4] != ".psd":
             file_id += ".psd"
 
-    if args.NO_CORPUS:
+    if args.jobs > 1 and not args.output:
+        # parallel workers cannot share the interactive stdout mode
+        print("--jobs requires --output, converting serially")
+        args.jobs = 1
 
-        c = depender.Converter()
+    if args.fixer_stats:
+        # worker processes keep their own stats
+        if args.jobs > 1:
+            print("--fixer_stats requires a single process, converting serially")
+            args.jobs = 1
+        atexit.register(lambda: print(depender.fixer_stats.report()))
 
-        file_num = 0
+    # output files and sentences unchanged since they were last converted
+    # are reused, see lib/cache.py
+    use_cache = args.output and not args.no_cache
 
-        for path in args.input:
-            psd = ""
-            file_sents = 0
-            file_num += 1
+    if args.NO_CORPUS:
 
-            input_path = path
-            output_file = (
-                re.sub(r"\.psd", ".conllu", os.path.basename(input_path))
-                if args.output
-                else None
+        output_paths = [
+            os.path.join(
+                "../CoNLLU/ppchy/",
+                re.sub(r"\.psd", ".conllu", os.path.basename(input_path)),
             )
-            # Took out if/else-blocj since there is only on corpus (atm)
-            output_path = (
-                os.path.join("../CoNLLU/ppchy/", output_file)
-                if output_file
-                else None
-            )
-
-            file_id = re.sub(r"\.psd", "", os.path.basename(input_path))
-
-            with open(input_path) if input_path else stdin as infile, open(
-                output_path, "w"
-            ) if output_path else stdout as outfile:
-                for line in infile.readlines():
-                    psd += line
-                    if len(line.strip()) == 0 and len(psd.strip()) > 0:
-
-                        dep = c.create_dependency_graph(psd)
-                        sent_id = (
-                            re.sub(r"\.psd", "", file_id).upper()
-                            + ",."
-                            + str(file_sents + 1)
-                        )
-                        sent_id = re.sub(r"/", "_", sent_id)
-                        sent_id_line = "# sent_id = " + sent_id + "\n"
-
-                        outfile.write(sent_id_line)
-                        outfile.write(str(dep.original_ID_plain_text()) + "\n")
-                        outfile.write(str(dep.plain_text()) + "\n")
-                        outfile.write(c.add_space_after(dep).to_conllU())
-
-                        if not output_path:
-                            input()
-                        file_sents += 1
-                        psd = ""
-
-                dep = c.create_dependency_graph(psd)
-                outfile.write(dep.to_conllU())
-
-            if output_path and args.post_process:
-                run_post_file(output_path)
+            if args.output
+            else None
+            for input_path in args.input
+        ]
+
+        # files unchanged since they were last converted are reused
+        cache = BuildCache() if use_cache else None
+        todo = []
+        for file_num, (input_path, output_path) in enumerate(
+            zip(args.input, output_paths), start=1
+        ):
+            key = cache.key(input_path, "N") if cache else None
+            file_sents = cache.get(output_path, key) if cache else None
+            if file_sents is None:
+                todo.append((file_num, input_path, output_path, key))
+            else:
+                file_id = re.sub(r"\.psd", "", os.path.basename(input_path))
+                print(f"{file_num}\t{file_id}\t{file_sents}")
 
-            print(f"{file_num}\t{file_id}\t{file_sents+1}")
+        try:
+            if args.jobs > 1:
+                # each worker process converts whole files with its own Converter
+                with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+                    futures = {
+                        executor.submit(
+                            convert_psd_file,
+                            input_path,
+                            output_path,
+                            args.post_process,
+                            use_cache,
+                        ): (file_num, input_path, output_path, key)
+                        for file_num, input_path, output_path, key in todo
+                    }
+                    for future in as_completed(futures):
+                        file_num, input_path, output_path, key = futures[future]
+                        file_sents = future.result()
+                        if cache:
+                            cache.put(output_path, key, file_sents)
+                        file_id = re.sub(r"\.psd", "", os.path.basename(input_path))
+                        print(f"{file_num}\t{file_id}\t{file_sents}")
+            else:
+                for file_num, input_path, output_path, key in todo:
+                    file_sents = convert_psd_file(
+                        input_path, output_path, args.post_process, use_cache
+                    )
+                    if cache:
+                        cache.put(output_path, key, file_sents)
+                    file_id = re.sub(r"\.psd", "", os.path.basename(input_path))
+                    print(f"{file_num}\t{file_id}\t{file_sents}")
+        finally:
+            if cache:
+                cache.save()
+                if cache.reused:
+                    print(f"> {cache.reused} unchanged files reused")
 
         exit()
 
@@ -202,42 +786,41 @@ def main():
     nltk_path.extend([corpus_path])
     CORPUS = load_corpus(args.CORPUS_NAME)
 
-    if args.ID_number:
+    if args.ID_number or args.ID_range:
         if args.output:
             print("Single sentence cannot be written to file.")
             exit()
-        INPUT_ID = args.ID_number
-        file_id = INPUT_ID.split(",")[0].lower() + ".psd"
-        tree_num = INPUT_ID.split(",")[1]
+        INPUT_IDS = args.ID_range or [args.ID_number]
+        file_id = INPUT_IDS[0].split(",")[0].lower() + ".psd"
+        tree_nums = [INPUT_ID.split(",")[1] for INPUT_ID in INPUT_IDS]
+
+        # trees looked up in the sidecar index of the file, built on first use
+        try:
+            handles = CORPUS.tree_index(file_id).handles(tree_nums[0], tree_nums[-1])
+        except KeyError:
+            print(f"Error! No tree found for ID {' - '.join(INPUT_IDS)}\n")
+            exit()
+
+        if args.auto_tag:
+            c = depender.Converter(auto_tags="single_sentence")
+        else:
+            c = depender.Converter()
 
-        for tree in CORPUS.parsed_sents(file_id):
+        for handle in handles:
+            tree = handle.tree
+            if tree is None:
+                continue
             # Catch error in corpus where ? token is missing
             tree = fix_IcePaHC_tree_errors(tree)
-            if tree.corpus_id_num == tree_num:
-                TREE = tree.remove_nodes(tags=["CODE"], trace=True)
-            else:
-                continue
+            TREE = tree.remove_nodes(tags=["CODE"], trace=True)
 
-        try:
             print(TREE)
             print()
-            if args.auto_tag:
-                c = depender.Converter(auto_tags="single_sentence")
-            elif args.faroese:
-                c = depender.Converter(faroese=True)
-            else:
-                c = depender.Converter()
             dep = c.create_dependency_graph(TREE)
             dep = c.add_space_after(dep)
             print(dep.original_ID)
             print(dep.plain_text())
             print(dep.to_conllU())
-            # input()
-            psd = ""
-
-        except ValueError:
-            raise
-            print(f"Error! No tree found for ID {INPUT_ID}\n")
 
     if args.file:
         # iterates over each sentence in a file, using corpus fileid NLTK feature
@@ -250,256 +833,107 @@ def main():
             # c = depender.Converter(faroese=True)
         # else:
             # uses treebank PoS tags for UD features
-        c = depender.Converter() # only this option is viable for the PPCHY I think
-            # there is no tagger (yet?), so this should be the only option
+        # only the treebank tags are viable for the PPCHY I think
+        # there is no tagger (yet?), so this should be the only option
+
+        cache = BuildCache() if use_cache else None
+        if cache:
+            output_path = corpus_output_path(file_id)
+            key = cache.key(str(CORPUS.abspath(file_id)), "corpus")
+            file_sents = cache.get(output_path, key)
+        else:
+            file_sents = None
+
+        if file_sents is not None:
+            print(f"> {file_id} unchanged - Output sentences: {file_sents}")
+        else:
+            if args.jobs > 1:
+                with open(corpus_output_path(file_id), "w") as outfile:
+                    file_sents = convert_file_parallel(
+                        CORPUS,
+                        corpus_path,
+                        args.CORPUS_NAME,
+                        file_id,
+                        args.jobs,
+                        outfile,
+                        use_cache,
+                    )
+            else:
+                file_sents = convert_trees(CORPUS, file_id, args.output, use_cache=use_cache)
 
-        to_join = []  # list for use in joining d.graphs into whole sentences
-        file_sents = 0  # no. of sentence from current file
+            if cache:
+                cache.put(output_path, key, file_sents)
+                cache.save()
 
-        # path to output saved if indicated, else saved as None
-        output_file = re.sub(r"\.psd", ".conllu", file_id) if args.output else None
-        # deleted additions and faroese options
-        output_path = (
-               os.path.join("../CoNLLU/icepahc/", output_file) if output_file else None
-        )
+            if args.output and args.post_process:
+                # if writing to file and postprocessing script indicated, runs
+                # script on file
+                run_post_file(corpus_output_path(file_id))
 
-        with open(output_path, "w") if args.output else stdout as outfile:
-            # open file if writing to output, else to stdout, either way called
-            # 'outfile' in below code
-
-            # counter set for missing tree IDs in corpus
-            missing_id_counter = 0
-
-            for tree in CORPUS.parsed_sents(file_id):
-                # counter for missing IDs incremented for every tree in corpus
-                missing_id_counter += 1
-                # Catch error in corpus where ? token is missing (IcePaHC specific)
-                tree = fix_IcePaHC_tree_errors(tree)
-                # Tree static variable defined, code nodes and some traces removed
-                TREE = tree.remove_nodes(tags=["CODE"], trace=True)
-
-                # Tree ID created if missing
-                if not TREE.corpus_id:
-                    TREE.corpus_id = "ID_missing_" + str(missing_id_counter)
-
-                dep = c.create_dependency_graph(TREE)
-
-                # conversion happens here
-                if (
-                    dep.get_by_address(len(dep.nodes) - 1)["word"]
-                    not in {".", ":", "?", "!", "kafli", '"'}
-                    and len(dep.nodes) != 1
-                ):
-                    # checks for incomplete sentence (single clause) by checking
-                    # puntuation and specific words (e.g. 'kafli')
-                    to_join.append(dep)
-                else:
-                    # if end of sentence detected
-                    try:
-                        # try to print whole CoNLLU from dependency graph
-                        # TODO: Fix redundancy of if/else statement
-                        if len(to_join) == 0:
-                            # there is nothing in 'to_join', so the sentence
-                            # is complete already
-
-                            # sentence ID saved as string using file_sent runner
-                            sent_id = (
-                                re.sub(r"\.psd", "", file_id).upper()
-                                + ",."
-                                + str(file_sents + 1)
-                            )
-                            sent_id = re.sub(r"\/", "_", sent_id)
-                            sent_id_line = "# sent_id = " + sent_id + "\n"
-
-                            # add NoSpaceAfter to misc column
-                            dep = c.add_space_after(dep)
-
-                            # output written:
-                            # sentence ID
-                            outfile.write(sent_id_line)
-                            # sent ID from original treebank
-                            outfile.write(str(dep.original_ID_plain_text()) + "\n")
-                            # sentence text
-                            outfile.write(str(dep.plain_text()) + "\n")
-                            # sentence CoNLLU
-                            outfile.write(dep.to_conllU())
-
-                            if not output_path:
-                                # when writing to stdout, asks for user input (enter)
-                                input()
-                            file_sents += 1  # sentence count runner incremented by 1
-                        else:
-                            # dependency graphs in 'to_join' joined into single graph
-                            # otherwise same as above
-                            to_join.append(dep)
-                            dep = c.add_space_after(c.join_graphs(to_join))
-
-                            # sentence ID saved as string using file_sent runner
-                            sent_id = (
-                                re.sub(r"\.psd", "", file_id).upper()
-                                + ",."
-                                + str(file_sents + 1)
-                            )
-                            sent_id = re.sub(r"/", "_", sent_id)
-                            sent_id_line = "# sent_id = " + sent_id + "\n"
-
-                            # add NoSpaceAfter to misc column
-                            dep = c.add_space_after(dep)
-
-                            # output written:
-                            # sentence ID
-                            outfile.write(sent_id_line)
-                            # sent ID from original treebank
-                            outfile.write(str(dep.original_ID_plain_text()) + "\n")
-                            # sentence text
-                            outfile.write(str(dep.plain_text()) + "\n")
-                            # sentence CoNLLU
-                            outfile.write(dep.to_conllU())
-
-                            if not output_path:
-                                # when writing to stdout, asks for user input (enter)
-                                input()
-                            file_sents += 1  # sentence count runner incremented by 1
-
-                    except Exception as ex:
-                        # catches any exception
-                        raise
-                        print("\n\n", dep.original_ID_plain_text(CORPUS="PPCHY"))
-                        print(f"{type(ex).__name__} for sentence: {ex.args}\n\n")
-                    to_join = []
-
-        if output_path and args.post_process:
-            # if writing to file and postprocessing script indicated, runs
-            # script on file
-            run_post_file(output_path)
+            if args.output:
+                print(f"> Converting {file_id} - Output sentences: {file_sents}")
 
     if args.corpus:
 
-        # deleted autotags and faroese
-        c = depender.Converter()
-
         fileids = CORPUS.fileids()
 
-        for file_id in fileids:
-            # not applicable to the PPCHY
-            # if file_id == "1823.ntmatt.rel-bib.psd":
-            #     continue
-
-            print(f"> Converting {file_id} ...", end="\r")
-
-            tag_dict = tagged_corpus(CORPUS.parsed_sents(file_id))
-            c.set_tag_dict(tag_dict)
-
-            to_join = []
-            to_tag = ""
-            file_sents = 0  # no. of sentence from current file
-
-            output_file = re.sub(r"\.psd", ".conllu", file_id) if args.output else None
-            output_path = (
-                os.path.join("../CoNLLU/ppchy/", output_file)
-                if output_file
-                else None
-            )
+        # files unchanged since they were last converted are reused
+        cache = BuildCache() if use_cache else None
+        keys = {}
+        if cache:
+            todo = []
+            for file_id in fileids:
+                keys[file_id] = cache.key(str(CORPUS.abspath(file_id)), "corpus")
+                file_sents = cache.get(corpus_output_path(file_id), keys[file_id])
+                if file_sents is None:
+                    todo.append(file_id)
+                else:
+                    print(f"> {file_id} unchanged - Output sentences: {file_sents}")
+            fileids = todo
 
-            with open(output_path, "w") if args.output else stdout as outfile:
-
-                # counter set for missing tree IDs in corpus
-                missing_id_counter = 0
-
-                for tree in CORPUS.parsed_sents(file_id):
-
-                    # counter for missing IDs incremented for every tree in corpus
-                    missing_id_counter += 1
-
-                    # Catch error in corpus where ? token is missing
-                    tree = fix_IcePaHC_tree_errors(tree)
-
-                    TREE = tree.remove_nodes(tags=["CODE"], trace=True)
-
-                    # Tree ID created if missing
-                    if not TREE.corpus_id:
-                        TREE.corpus_id = "ID_missing_" + str(missing_id_counter)
-
-                    dep = c.create_dependency_graph(TREE)
-
-                    if (
-                        dep.get_by_address(len(dep.nodes) - 1)["word"]
-                        not in {".", ":", "?", "!", "kafli", '"'}
-                        and len(dep.nodes) != 1
-                    ):
-                        to_join.append(dep)
-                    else:
-                        try:
-                            if len(to_join) == 0:
-
-                                # sentence ID saved as string using file_sent runner
-                                sent_id = (
-                                    re.sub(r"\.psd", "", file_id).upper()
-                                    + ",."
-                                    + str(file_sents + 1)
-                                )
-                                sent_id = re.sub(r"/", "_", sent_id)
-                                sent_id_line = "# sent_id = " + sent_id + "\n"
-
-                                # add NoSpaceAfter to misc column
-                                dep = c.add_space_after(dep)
-
-                                # output written:
-                                # sentence ID
-                                outfile.write(sent_id_line)
-                                # sent ID from original treebank
-                                outfile.write(str(dep.original_ID_plain_text()) + "\n")
-                                # sentence text
-                                outfile.write(str(dep.plain_text()) + "\n")
-                                # sentence CoNLLU
-                                outfile.write(dep.to_conllU())
-
-                                if not output_path:
-                                    input()
-
-                                file_sents += (
-                                    1  # sentence count runner incremented by 1
-                                )
-
-                            else:
-                                to_join.append(dep)
-                                dep = c.add_space_after(c.join_graphs(to_join))
-
-                                # sentence ID saved as string using file_sent runner
-                                sent_id = (
-                                    re.sub(r"\.psd", "", file_id).upper()
-                                    + ",."
-                                    + str(file_sents + 1)
-                                )
-                                sent_id = re.sub(r"/", "_", sent_id)
-                                sent_id_line = "# sent_id = " + sent_id + "\n"
-
-                                # add NoSpaceAfter to misc column
-                                dep = c.add_space_after(dep)
-
-                                # output written:
-                                # sentence ID
-                                outfile.write(sent_id_line)
-                                # sent ID from original treebank
-                                outfile.write(str(dep.original_ID_plain_text()) + "\n")
-                                # sentence text
-                                outfile.write(str(dep.plain_text()) + "\n")
-                                # sentence CoNLLU
-                                outfile.write(dep.to_conllU())
-
-                                if not output_path:
-                                    input()
-
-                                file_sents += (
-                                    1  # sentence count runner incremented by 1
-                                )
-
-                        except Exception as ex:
-                            raise
-                            print("\n\n", dep.original_ID_plain_text(CORPUS="PPCHY"))
-                            print(f"{type(ex).__name__} for sentence: {ex.args}\n\n")
-                        to_join = []
-            print(f"> Converting {file_id} - Output sentences: {file_sents}")
+        try:
+            if args.jobs > 1:
+                # files are fanned out to worker processes, each of which loads
+                # the corpus and builds its own Converter
+                with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+                    futures = {
+                        executor.submit(
+                            _convert_corpus_file_worker,
+                            corpus_path,
+                            args.CORPUS_NAME,
+                            file_id,
+                            args.output,
+                            use_cache,
+                        ): file_id
+                        for file_id in fileids
+                    }
+                    for num, future in enumerate(as_completed(futures), start=1):
+                        file_id = futures[future]
+                        file_sents = future.result()
+                        if cache:
+                            cache.put(corpus_output_path(file_id), keys[file_id], file_sents)
+                        print(
+                            f"> Converting {file_id} ({num}/{len(fileids)})"
+                            f" - Output sentences: {file_sents}"
+                        )
+            else:
+                for file_id in fileids:
+                    # not applicable to the PPCHY
+                    # if file_id == "1823.ntmatt.rel-bib.psd":
+                    #     continue
+
+                    print(f"> Converting {file_id} ...", end="\r")
+                    file_sents = convert_corpus_file(
+                        CORPUS, file_id, args.output, use_cache
+                    )
+                    if cache:
+                        cache.put(corpus_output_path(file_id), keys[file_id], file_sents)
+                    print(f"> Converting {file_id} - Output sentences: {file_sents}")
+        finally:
+            if cache:
+                cache.save()
+                if cache.reused:
+                    print(f"> {cache.reused} unchanged files reused")
 
     print("All done!")
 
@@ -1,4 +1,4 @@
-from lib.joiners import NodeJoiner, FileWriter
+from lib.joiners import NodeJoiner, FileWriter, RulePipeline
 import sys
 
 '''
@@ -10,6 +10,7 @@ Text preperation script for IcePaHC corpus file (.psd). Not to be run by itself,
 part of preprocessing pipeline.
  - Joins various nodes in IcePaHC files that have been split, mostly by '$'
  - See module code for further documentation
+ - Run with --stats after the file path for per rule hit counts and timings
 
 adapted by zdlpaul (paul.zodl@uni-konstanz.de)
 2025
@@ -24,20 +25,29 @@ if __name__ == '__main__':
     file = open(IN_PATH, 'r')
     j = NodeJoiner(file)
     # print(j.name)
-    for n in j.indexes:
+    # all rules run in a single pass over the lines, each on a window of up to
+    # 3 lines around the current line (see RULES in lib/joiners.py)
+    pipeline = RulePipeline([
         # These two need serious work!
-        j.join_verbs_same_line(n)
-        j.join_verbs_two_lines(n)
-        j.join_verbs_three_lines(n)
-        # j.remove_punctuation(n)
-        j.join_adverbs(n)
-        j.assign_reflexive(n)
-        j.assign_case(n)
-        j.case_concord_one_line(n)
-        j.case_concord_conjunction(n)
-        j.assign_definiteness(n)
-        j.join_preposition_determiner(n)
-        j.delete_case_stacking(n)
+        "join_verbs_same_line",
+        "join_verbs_two_lines",
+        "join_verbs_three_lines",
+        # "remove_punctuation",
+        "join_adverbs",
+        "assign_reflexive",
+        "assign_case",
+        "case_concord_one_line",
+        "case_concord_conjunction",
+        "assign_definiteness",
+        "join_preposition_determiner",
+        "delete_case_stacking",
+    ], stats="--stats" in sys.argv[2:])
+    pipeline.run(j)
+
+    if pipeline.stats:
+        # per rule calls, hits and timings
+        print(IN_PATH, file=sys.stderr)
+        print(pipeline.report(), file=sys.stderr)
 
     # output written to file
     f = FileWriter(j)
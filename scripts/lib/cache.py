@@ -0,0 +1,526 @@
+"""
+Build caches for the conversion, so that unchanged .psd files and trees are
+not converted again.
+
+A converted file is reused if the input .psd file, the conversion mode and the
+code of the converter (convert.py and everything in lib/) are the same as
+when it was written, and the .conllu file itself has not been changed or
+deleted since. Within a changed file, the CoNLL-U of every sentence whose
+trees are unchanged is reused from the tree cache. Trees that have to be
+converted again are read from a binary cache of parsed trees if their text
+and the parser code are unchanged. The caches live in the .cache folder at
+the top of the repository.
+
+adapted by zdlpaul (paul.zodl@uni-konstanz.de)
+2025
+"""
+
+import os
+import sys
+import json
+import struct
+import sqlite3
+import hashlib
+from array import array
+from functools import lru_cache
+
+from lib.reader import IndexedCorpusTree, symbol
+
+LIB_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.dirname(LIB_DIR)
+CACHE_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), ".cache")
+
+
+def file_hash(path):
+    """
+    Returns the SHA-256 hex digest of the contents of a file
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_fingerprint():
+    """
+    Returns a hash of the converter code, i.e. convert.py and the modules in
+    lib/ (rules, features, depender etc.). Any change to these invalidates
+    all cached output.
+    """
+    sha = hashlib.sha256()
+    paths = [os.path.join(SCRIPTS_DIR, "convert.py")] + sorted(
+        os.path.join(LIB_DIR, name)
+        for name in os.listdir(LIB_DIR)
+        if name.endswith(".py")
+    )
+    for path in paths:
+        sha.update(os.path.basename(path).encode())
+        sha.update(file_hash(path).encode())
+    return sha.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def parser_fingerprint():
+    """
+    Returns a hash of the code the parsed trees depend on, i.e. the reader
+    with the node joiners of the preprocessing, and of the format of the
+    parsed tree cache
+    """
+    sha = hashlib.sha256(f"{ParsedTreeCache.VERSION}:{sys.byteorder}".encode())
+    for name in ("joiners.py", "reader.py"):
+        sha.update(name.encode())
+        sha.update(file_hash(os.path.join(LIB_DIR, name)).encode())
+    return sha.hexdigest()
+
+
+class BuildCache:
+    """
+    File level build cache, a manifest of the .conllu files written by
+    convert.py with the key they were built from, their number of sentences
+    and the hash of their contents.
+
+    Only used from the main process, worker processes just convert.
+
+    Args:
+        path (str): path to the manifest file
+    """
+
+    def __init__(self, path=os.path.join(CACHE_DIR, "build.json")):
+        self.path = path
+        self.reused = 0
+        try:
+            with open(self.path) as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def key(self, input_path, mode):
+        """
+        Returns the build key of an input file converted in the given mode
+        (e.g. 'N' for --NO_CORPUS, 'corpus' for --file and --corpus)
+        """
+        return f"{mode}:{file_hash(input_path)}:{code_fingerprint()}"
+
+    def get(self, output_path, key):
+        """
+        Returns the number of sentences of output_path if it was built from
+        key and is unchanged, else None
+        """
+        entry = self.entries.get(os.path.abspath(output_path))
+        if not entry or entry["key"] != key:
+            return None
+        if not os.path.exists(output_path) or file_hash(output_path) != entry["hash"]:
+            return None
+        self.reused += 1
+        return entry["sents"]
+
+    def put(self, output_path, key, sents):
+        """
+        Records output_path as built from key, with sents sentences
+        """
+        self.entries[os.path.abspath(output_path)] = {
+            "key": key,
+            "sents": sents,
+            "hash": file_hash(output_path),
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.entries, file, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class TreeCache:
+    """
+    Content addressed cache of converted trees, stored in an SQLite database
+    so that worker processes can share it.
+
+    Every tree is keyed on its normalized text and the code fingerprint. For
+    a tree the cache records whether it ends a sentence, i.e. whether its
+    dependency graph is joined with the following ones, and for a sentence
+    (the keys of its trees) the CoNLL-U lines following its sent_id line.
+    Sentence numbers are not part of the cache, so inserting or deleting a
+    tree does not invalidate the rest of the file.
+
+    The database is in WAL mode and new rows are written in short
+    transactions of BATCH_SIZE rows, so that readers are never blocked and
+    the worker processes of --jobs only wait for each other's batches.
+
+    Args:
+        path (str): path to the database file
+    """
+
+    # number of new rows kept in memory before they are written
+    BATCH_SIZE = 100
+
+    def __init__(self, path=os.path.join(CACHE_DIR, "trees.sqlite")):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS trees (key TEXT PRIMARY KEY, ends INTEGER)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sentences (key TEXT PRIMARY KEY, body TEXT)"
+        )
+        self.db.commit()
+        # rows not written yet, table -> {key: value}
+        self.pending = {"trees": {}, "sentences": {}}
+
+    @staticmethod
+    def normalize(text):
+        """
+        Returns the text of a tree without trailing whitespace and blank
+        lines. Line breaks and indentation are kept, as the node joiners of
+        the preprocessing work line by line.
+        """
+        return "\n".join(line.rstrip() for line in text.splitlines() if line.strip())
+
+    def tree_key(self, text, *extra):
+        """
+        Returns the key of a tree from its raw text and any extra values the
+        conversion depends on (e.g. the position of a tree without an ID)
+        """
+        sha = hashlib.sha256(code_fingerprint().encode())
+        for part in (self.normalize(text),) + extra:
+            sha.update(b"\0" + str(part).encode())
+        return sha.hexdigest()
+
+    def sentence_key(self, mode, tree_keys):
+        """
+        Returns the key of a sentence made of the trees with tree_keys,
+        converted in the given mode (see BuildCache.key())
+        """
+        return hashlib.sha256(" ".join([mode] + list(tree_keys)).encode()).hexdigest()
+
+    def ends(self, key):
+        """
+        Returns whether the tree ends a sentence, None if not cached
+        """
+        if key in self.pending["trees"]:
+            return bool(self.pending["trees"][key])
+        row = self.db.execute("SELECT ends FROM trees WHERE key = ?", (key,)).fetchone()
+        return bool(row[0]) if row else None
+
+    def put_ends(self, key, ends):
+        self._put("trees", key, int(ends))
+
+    def sentence(self, key):
+        """
+        Returns the CoNLL-U of the sentence, None if not cached
+        """
+        if key in self.pending["sentences"]:
+            return self.pending["sentences"][key]
+        row = self.db.execute(
+            "SELECT body FROM sentences WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_sentence(self, key, body):
+        self._put("sentences", key, body)
+
+    def _put(self, table, key, value):
+        self.pending[table][key] = value
+        if sum(map(len, self.pending.values())) >= self.BATCH_SIZE:
+            self.commit()
+
+    def commit(self):
+        """
+        Writes the pending rows in one transaction
+        """
+        with self.db:
+            for table, rows in self.pending.items():
+                self.db.executemany(
+                    f"INSERT OR REPLACE INTO {table} VALUES (?, ?)", rows.items()
+                )
+                rows.clear()
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+class ParsedTreeCache:
+    """
+    Binary cache of the parsed and preprocessed trees of a .psd file, so that
+    trees which have to be converted again are not parsed again. Stored in
+    one file per input file and mode, and stamped with parser_fingerprint(),
+    so that all trees are parsed again when the reader or the joiners change.
+
+    Trees are looked up by their raw text. Labels, leaves and IDs are
+    interned in a symbol table, and all trees are stored in one flat
+    preorder array of symbols with the number of children of every node
+    (-1 for a leaf). A preterminal, the most common node, is stored as one
+    entry, with -2 - (symbol of its leaf) as its size. Every lookup returns
+    newly built trees, as the converter changes the trees it is given.
+
+    The cache file is only written by the process converting the file.
+    Worker processes converting parts of it hand the trees they parsed to
+    that process (see new_trees() and merge()). Trees of blocks that are no
+    longer in the file, i.e. that were changed or deleted, are dropped when
+    saved.
+
+    Args:
+        input_path (str): path to the .psd file
+        parse: function returning a list of at most one tree for the raw
+            text of a tree, see PPCHYFormatReader.parse_block()
+        mode (str): conversion mode the trees are parsed for, as parse()
+            differs between modes (see BuildCache.key())
+        blocks: function returning the raw texts of all trees in the file,
+            as they are looked up, or None to keep the trees of all texts
+        directory (str): folder of the cache files
+    """
+
+    VERSION = 1
+
+    MAGIC = b"PSDTREES"
+
+    def __init__(
+        self,
+        input_path,
+        parse,
+        mode,
+        blocks=None,
+        directory=os.path.join(CACHE_DIR, "parsed"),
+    ):
+        name = os.path.basename(input_path)
+        path_hash = hashlib.sha256(os.path.abspath(input_path).encode()).hexdigest()
+        self.path = os.path.join(directory, f"{name}.{mode}.{path_hash[:12]}.trees")
+        self.parse = parse
+        self.blocks = blocks
+        self.reused = 0
+        self.changed = False
+        self._clear()
+        self._read(self.path)
+
+    def _clear(self):
+        self.symbols = []
+        self.texts = {}  # raw text -> position of the tree in offsets
+        self.offsets = array("I", [0])  # start of every tree in nodes
+        self.ids = array("i")  # symbol of the corpus ID, -1 if none, -2 if no tree
+        self.nodes = array("I")  # symbols of the nodes in preorder
+        self.sizes = array("i")  # number of children of the nodes
+        self.added = []  # raw texts of the trees added since the cache was read
+        self._interned = None
+
+    def _read(self, path):
+        """
+        Reads the cache file, returns whether it exists and has the current
+        stamp
+        """
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return False
+        stamp = self.MAGIC + parser_fingerprint().encode()
+        if not data.startswith(stamp):
+            return False
+        sections = []
+        pos = len(stamp)
+        try:
+            while pos < len(data):
+                (length,) = struct.unpack_from("<Q", data, pos)
+                pos += 8
+                sections.append(data[pos : pos + length])
+                pos += length
+            symbols, texts, offsets, ids, nodes, sizes = sections
+        except (struct.error, ValueError):
+            return False
+        self.symbols = [symbol(value) for value in symbols.decode().split("\0")]
+        self.texts = {
+            text: i for i, text in enumerate(texts.decode().split("\0")) if text
+        }
+        for values, section in (
+            (self.offsets, offsets),
+            (self.ids, ids),
+            (self.nodes, nodes),
+            (self.sizes, sizes),
+        ):
+            del values[:]
+            values.frombytes(section)
+        return True
+
+    def parse_block(self, block):
+        """
+        Returns the trees of the raw text of a tree, as parse() would, from
+        the cache if the text has been parsed before
+        """
+        position = self.texts.get(block)
+        if position is not None:
+            self.reused += 1
+            return self._build(position)
+        trees = self.parse(block)
+        self._add(block, trees)
+        return trees
+
+    def _build(self, position):
+        """
+        Builds the tree at a position from the preorder array, children
+        before their parents by going through it backwards
+        """
+        corpus_id = self.ids[position]
+        if corpus_id == -2:
+            return []
+        start, end = self.offsets[position], self.offsets[position + 1]
+        symbols = self.symbols
+        new = IndexedCorpusTree.__new__
+        init = list.__init__
+        stack = []
+        append = stack.append
+        for symbol, size in zip(
+            reversed(self.nodes[start:end]), reversed(self.sizes[start:end])
+        ):
+            if size < -1:
+                tree = new(IndexedCorpusTree)
+                init(tree, (symbols[-2 - size],))
+            elif size > 0:
+                tree = new(IndexedCorpusTree)
+                init(tree, stack[: -size - 1 : -1])
+                del stack[-size:]
+            elif size == -1:
+                append(symbols[symbol])
+                continue
+            else:
+                tree = new(IndexedCorpusTree)
+            tree._label = symbols[symbol]
+            append(tree)
+        (tree,) = stack
+        if corpus_id >= 0:
+            tree.corpus_id = symbols[corpus_id]
+            try:
+                tree.corpus_id_num = tree.corpus_id.split(",")[1]
+            except IndexError:
+                tree.corpus_id_num = None
+        return [tree]
+
+    def _intern(self, value):
+        """
+        Returns the position of a label, leaf or ID in the symbols of the
+        cache, adding it if needed
+        """
+        if self._interned is None:
+            self._interned = {value: i for i, value in enumerate(self.symbols)}
+        interned = self._interned.get(value)
+        if interned is None:
+            interned = self._interned[value] = len(self.symbols)
+            self.symbols.append(symbol(value))
+        return interned
+
+    def _add(self, block, trees):
+        """
+        Adds the trees of a raw text to the cache, before the converter
+        changes them
+        """
+        if block in self.texts:
+            return
+        intern = self._intern
+        nodes = []
+        sizes = []
+        if not trees:
+            corpus_id = -2
+        else:
+            tree = trees[0]
+            corpus_id = -1 if tree.corpus_id is None else intern(tree.corpus_id)
+            stack = [tree]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, str):
+                    nodes.append(intern(node))
+                    sizes.append(-1)
+                elif not isinstance(node, IndexedCorpusTree):
+                    # e.g. (word, tag) pairs of a flat parse of a bad tree
+                    return
+                elif len(node) == 1 and isinstance(node[0], str):
+                    nodes.append(intern(node._label))
+                    sizes.append(-2 - intern(node[0]))
+                else:
+                    nodes.append(intern(node._label))
+                    sizes.append(len(node))
+                    stack.extend(reversed(node))
+        self.ids.append(corpus_id)
+        self.nodes.extend(nodes)
+        self.sizes.extend(sizes)
+        self.offsets.append(len(self.nodes))
+        self.texts[block] = len(self.ids) - 1
+        self.added.append(block)
+        self.changed = True
+
+    def _keep(self, blocks):
+        """
+        Drops the trees of all raw texts not in blocks
+        """
+        kept = ParsedTreeCache.__new__(ParsedTreeCache)
+        kept._clear()
+        for block, position in self.texts.items():
+            if block in blocks:
+                kept._add(block, self._build(position))
+        self.symbols, self.texts, self._interned = (
+            kept.symbols,
+            kept.texts,
+            kept._interned,
+        )
+        self.offsets, self.ids, self.nodes, self.sizes = (
+            kept.offsets,
+            kept.ids,
+            kept.nodes,
+            kept.sizes,
+        )
+
+    def new_trees(self):
+        """
+        Returns a cache holding only the trees parsed since this cache was
+        read, to be sent from a worker process to the process saving the
+        cache (see merge())
+        """
+        new = ParsedTreeCache.__new__(ParsedTreeCache)
+        new._clear()
+        for block in self.added:
+            new._add(block, self._build(self.texts[block]))
+        return new
+
+    def merge(self, other):
+        """
+        Adds the trees of another cache of the same file, e.g. the new_trees()
+        of a worker process
+        """
+        for block, position in other.texts.items():
+            if block not in self.texts:
+                self._add(block, other._build(position))
+
+    def save(self):
+        """
+        Writes the cache file if trees were added, with only the trees of the
+        texts now in the file
+        """
+        if not self.changed:
+            return
+        if self.blocks:
+            blocks = set(self.blocks())
+            if not blocks.issuperset(self.texts):
+                self._keep(blocks)
+        texts = [""] * len(self.ids)
+        for text, position in self.texts.items():
+            texts[position] = text
+        sections = [
+            "\0".join(self.symbols).encode(),
+            "\0".join(texts).encode(),
+            self.offsets.tobytes(),
+            self.ids.tobytes(),
+            self.nodes.tobytes(),
+            self.sizes.tobytes(),
+        ]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(self.MAGIC + parser_fingerprint().encode())
+            for section in sections:
+                file.write(struct.pack("<Q", len(section)))
+                file.write(section)
+        os.replace(tmp_path, self.path)
+        self.changed = False
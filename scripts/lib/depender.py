@@ -14,20 +14,224 @@ adapted by zdlpaul (paul.zodl@uni-konstanz.de)
 from lib.features import *
 
 # from lib import DMII_data
-from lib.reader import IndexedCorpusTree
-from lib.rules import head_rules
-from lib.tools import determine_relations, decode_escaped
+from lib.reader import IndexedCorpusTree, VERB_PREFIXES, symbol
+from lib.rules import get_head_rule
+from lib.tools import resolve_relation, decode_escaped
 from lib.joiners import NodeJoiner
 
 from nltk.tree import Tree
 from nltk.parse import DependencyGraph
 from sys import argv, stdin, stdout
 import getopt
-from collections import defaultdict
+from collections import defaultdict, Counter
+from time import perf_counter
 import re
 import string
 
 
+def _none():
+    return None
+
+
+def _is_verb(tag):
+    return tag is not None and tag[0:2] in VERB_PREFIXES
+
+
+class Token:
+    """
+    A token (node) of a UniversalDependencyGraph, a view of its row in the
+    columns of the graph's TokenTable. Supports the dict operations used on
+    nodes, e.g. token["rel"], token.update({"head": 3}) and **token.
+
+    The misc and deps dictionaries are created when first read, as most
+    tokens never have any.
+    """
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        column = self._table.columns.get(key)
+        if column is None:
+            extra = self._table.extra[self._row]
+            if extra is None or key not in extra:
+                raise KeyError(key)
+            return extra[key]
+        value = column[self._row]
+        if value is None and key in TokenTable.LAZY:
+            value = column[self._row] = TokenTable.LAZY[key]()
+        return value
+
+    def __setitem__(self, key, value):
+        column = self._table.columns.get(key)
+        if column is None:
+            if self._table.extra[self._row] is None:
+                self._table.extra[self._row] = {}
+            self._table.extra[self._row][key] = value
+        else:
+            if key in TokenTable.SYMBOLS and value.__class__ is str:
+                value = symbol(value)
+            old = column[self._row]
+            if old is value:
+                return
+            if key in TokenTable.TRACKED and self._table.alive[self._row]:
+                self._table.track(self._row, key, old, value)
+            column[self._row] = value
+            self._table.changes += 1
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def keys(self):
+        extra = self._table.extra[self._row]
+        if extra is None:
+            return TokenTable.FIELDS
+        return TokenTable.FIELDS + tuple(extra)
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, values):
+        for key, value in values.items():
+            self[key] = value
+
+
+class TokenTable:
+    """
+    The tokens of a dependency graph stored by column, a list for each field
+    (head, rel, ctag, tag etc.) with a row for each token, and a mapping
+    from addresses to rows. Behaves like the dict of nodes of an NLTK
+    DependencyGraph, with Token views of the rows as values, except that
+    looking up a missing address raises a KeyError instead of adding an
+    empty node.
+    """
+
+    FIELDS = (
+        "address",
+        "word",
+        "lemma",
+        "ctag",  # upostag
+        "tag",  # xpostag
+        "feats",
+        "head",
+        "deps",
+        "rel",
+        "misc",
+    )
+    DEFAULTS = {"head": "_"}  # None for the other fields
+    LAZY = {"deps": lambda: defaultdict(list), "misc": lambda: defaultdict(_none)}
+    TRACKED = {"rel", "ctag", "tag", "head"}
+    SYMBOLS = {"rel", "ctag", "tag"}  # values kept in the symbol table
+
+    def __init__(self):
+        self.columns = {field: [] for field in self.FIELDS}
+        self.extra = []  # dict of any other fields for each row, or None
+        self.tokens = []  # Token view of each row
+        self.alive = []  # False for the rows of deleted tokens
+        self.rows = {}  # address -> row
+        # counts and dependents of the tokens in the table, kept up to date
+        # on every change
+        self.counts = {"rel": Counter(), "ctag": Counter()}
+        self.verbs = 0
+        self.heads = defaultdict(dict)  # head -> rows of its dependents
+        self.changes = 0  # number of field values set, see FixerStats
+
+    def track(self, row, field, old, new):
+        """
+        Updates the counts and dependents when a tracked field of the token
+        in row changes from old to new
+        """
+        if field == "head":
+            del self.heads[old][row]
+            self.heads[new][row] = None
+        elif field == "tag":
+            self.verbs += _is_verb(new) - _is_verb(old)
+        else:
+            counts = self.counts[field]
+            counts[old] -= 1
+            counts[new] += 1
+
+    def add(self, address, values=None):
+        """
+        Adds a token at address with the given field values and returns it
+        """
+        row = len(self.tokens)
+        for field, column in self.columns.items():
+            column.append(self.DEFAULTS.get(field))
+        self.extra.append(None)
+        self.alive.append(True)
+        self.counts["rel"][None] += 1
+        self.counts["ctag"][None] += 1
+        self.heads[self.DEFAULTS["head"]][row] = None
+        token = Token(self, row)
+        self.tokens.append(token)
+        if values:
+            token.update(values)
+        self.rows[address] = row
+        return token
+
+    def __getitem__(self, address):
+        return self.tokens[self.rows[address]]
+
+    def __delitem__(self, address):
+        row = self.rows.pop(address)
+        self.alive[row] = False
+        self.counts["rel"][self.columns["rel"][row]] -= 1
+        self.counts["ctag"][self.columns["ctag"][row]] -= 1
+        self.verbs -= _is_verb(self.columns["tag"][row])
+        del self.heads[self.columns["head"][row]][row]
+
+    def dependents(self, head):
+        """
+        Returns the tokens whose head is head, in the order they were added
+        """
+        rows = self.heads.get(head)
+        return [self.tokens[row] for row in sorted(rows)] if rows else []
+
+    def __contains__(self, address):
+        return address in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def keys(self):
+        return self.rows.keys()
+
+    def values(self):
+        return (self.tokens[row] for row in self.rows.values())
+
+    def items(self):
+        return ((address, self.tokens[row]) for address, row in self.rows.items())
+
+    def get(self, address, default=None):
+        row = self.rows.get(address)
+        return default if row is None else self.tokens[row]
+
+
 class UniversalDependencyGraph(DependencyGraph):
     """
     Takes in a nltk Tree object and returns an approximation of the tree
@@ -66,26 +270,15 @@ class UniversalDependencyGraph(DependencyGraph):
             top_relation_label,
         )
 
-        self.nodes = defaultdict(
-            lambda: {
-                "address": None,
-                "word": None,
-                "lemma": None,
-                "ctag": None,  # upostag
-                "tag": None,  # xpostag
-                "feats": defaultdict(lambda: None),
-                "head": "_",  # None, # TODO: find permanent fix!
-                "deps": defaultdict(list),
-                "rel": None,
-                "misc": defaultdict(lambda: None),  # testing adding Misc column
-            }
-        )
-        self.nodes[0].update(
+        # head defaults to "_", # TODO: find permanent fix!
+        self.nodes = TokenTable()
+        self.nodes.add(
+            0,
             {
                 "ctag": "TOP",
                 "tag": "TOP",
                 "ID": 0,
-            }
+            },
         )
         self.original_ID = None
 
@@ -93,6 +286,33 @@ class UniversalDependencyGraph(DependencyGraph):
 
     # todo _parse for CoNLL-U
 
+    def add_node(self, node):
+        """
+        Adds a node (dict or Token) at its address, unless the address is
+        taken. The values are copied, so a Token of another graph can be
+        added.
+        """
+        if node["address"] not in self.nodes:
+            self.nodes.add(node["address"], node)
+
+    def add_arc(self, head_address, mod_address):
+        """
+        Adds an arc from the node at head_address to the node at
+        mod_address, see get_by_address() for missing nodes.
+        """
+        relation = self.get_by_address(mod_address)["rel"]
+        self.get_by_address(head_address)["deps"][relation].append(mod_address)
+
+    def get_by_address(self, node_address):
+        """
+        Returns the node at the given address. For an address without a
+        node an empty node is returned, which is not added to the graph.
+        """
+        node = self.nodes.get(node_address)
+        if node is None:
+            node = TokenTable().add(None)
+        return node
+
     def _deps_str(self, deps_dict):
         # todo, format should be "4:nsubj|11:nsubj", see http://universaldependencies.github.io/docs/format.html
         return "_"  # return ''.join('%s:%s,' % (dep, '+'.join(str(rel))) for (dep, rel) in deps_dict.items())[0:-1]
@@ -136,26 +356,20 @@ class UniversalDependencyGraph(DependencyGraph):
         Checks and counts the relations in the sentence
 
         Returns:
-            defaultdict: Relations found in the sentence graph, counted.
+            Counter: Relations found in the sentence graph, counted. The
+                counts are live, i.e. follow any later change to the graph.
         """
-        rels = defaultdict(int)
-        rels["root"] = 0
-        rels["ccomp/xcomp"] = 0
-        for node in self.nodes.values():
-            rels[node["rel"]] += 1
-        return rels
+        return self.nodes.counts["rel"]
 
     def ctags(self):
         """
         Checks and counts the IcePaHC tags in the sentence
 
         Returns:
-            defaultdict: IcePaHC tags found in the sentence graph, counted.
+            Counter: IcePaHC tags found in the sentence graph, counted. The
+                counts are live, i.e. follow any later change to the graph.
         """
-        ctags = defaultdict(int)
-        for node in self.nodes.values():
-            ctags[node["ctag"]] += 1
-        return ctags
+        return self.nodes.counts["ctag"]
 
     def num_roots(self):
         """
@@ -166,7 +380,7 @@ class UniversalDependencyGraph(DependencyGraph):
         Returns:
             int: Number of root relations found in sentence.
         """
-        return self.rels()["root"]
+        return self.nodes.counts["rel"]["root"]
 
     def root_address(self):
         """
@@ -179,6 +393,13 @@ class UniversalDependencyGraph(DependencyGraph):
             if node["rel"] == "root":
                 return address
 
+    def dependents(self, address):
+        """
+        Returns the nodes whose head is the node at address, in the order of
+        the graph. Looked up in an index, without a scan of the graph.
+        """
+        return self.nodes.dependents(address)
+
     def num_verbs(self):
         """09.03.20
         Checks by POS (IcePaHC PoS tag) how many verbs are in sent. graph.
@@ -190,22 +411,7 @@ class UniversalDependencyGraph(DependencyGraph):
 
         # TODO: Finish implementation
         """
-
-        verb_count = 0
-        for node in self.nodes.values():
-            if node["tag"] == None:
-                continue
-            elif node["tag"][0:2] in {
-                "VB",
-                "BE",
-                "DO",
-                "HV",
-                "MD",
-                "RD",
-            }:
-                verb_count += 1
-
-        return verb_count
+        return self.nodes.verbs
 
     def num_subj(self):
         """
@@ -265,23 +471,45 @@ class UniversalDependencyGraph(DependencyGraph):
         # TODO: _misc_string
         """
 
-        template = "{i}\t{word}\t{lemma_str}\t{ctag}\t{tag}\t{feats_str}\t{head}\t{rel}\t{deps_str}\t{misc_str}\n"
-
-        return self.join_output_nodes(
-            "".join(
-                template.format(
-                    i=i,
-                    **node,
-                    lemma_str=node["lemma"] if node["lemma"] else "_",
-                    deps_str=self._deps_str(node["deps"]),
-                    feats_str=self._dict_to_string(node["feats"]),
-                    misc_str=self._dict_to_string(node["misc"]),
-                )
-                for i, node in sorted(filter(lambda x: x[0] != "_", self.nodes.items()))
-                if node["tag"] != "TOP" and node["word"] != None
+        return "".join(self.conllU_lines()) + "\n"
+
+    def conllU_lines(self):
+        """
+        Yields the word lines of the graph in CoNLL-U format, see
+        to_conllU(), in the order of their addresses. The fields are read
+        straight from the columns of the tokens, so that the lazy misc and
+        deps fields of a token are not created for writing it.
+
+        The lines are not passed through join_output_nodes(), which has no
+        joining rules enabled.
+        """
+        nodes = self.nodes
+        columns = nodes.columns
+        word, lemma, ctag, tag, feats, head, deps, rel, misc = (
+            columns[field]
+            for field in (
+                "word",
+                "lemma",
+                "ctag",
+                "tag",
+                "feats",
+                "head",
+                "deps",
+                "rel",
+                "misc",
             )
-            + "\n"
         )
+        dict_to_string = self._dict_to_string
+        deps_str = self._deps_str
+        for address in sorted(address for address in nodes.rows if address != "_"):
+            row = nodes.rows[address]
+            if tag[row] == "TOP" or word[row] is None:
+                continue
+            yield (
+                f"{address}\t{word[row]}\t{lemma[row] or '_'}\t{ctag[row]}\t"
+                f"{tag[row]}\t{dict_to_string(feats[row])}\t{head[row]}\t"
+                f"{rel[row]}\t{deps_str(deps[row])}\t{dict_to_string(misc[row])}\n"
+            )
 
     def plain_text(self):
         """09.03.20
@@ -335,6 +563,103 @@ class UniversalDependencyGraph(DependencyGraph):
             )
 
 
+class Fixer:
+    """
+    A fix of the dependency graph, a method of Converter run by
+    create_dependency_graph() after the graph is filled out.
+
+    Args:
+        method (str): name of the Converter method
+        rels (set): relations the fixer is triggered by
+        ctags (set): UPOS tags the fixer is triggered by
+        min_count (int): count of any of the relations or UPOS tags in the
+            graph needed for the fixer to run. A fixer without relations and
+            UPOS tags always runs.
+    """
+
+    def __init__(self, method, rels=(), ctags=(), min_count=1):
+        self.method = method
+        self.rels = frozenset(rels)
+        self.ctags = frozenset(ctags)
+        self.min_count = min_count
+
+    def triggered(self, rel_counts, ctag_counts):
+        if not self.rels and not self.ctags:
+            return True
+        return any(rel_counts[rel] >= self.min_count for rel in self.rels) or any(
+            ctag_counts[ctag] >= self.min_count for ctag in self.ctags
+        )
+
+
+# The fixer pipeline, run in this order. Fixers are triggered by the counts
+# of the graph before the first fixer runs, not by the changes made by the
+# fixers before them.
+FIXERS = (
+    Fixer("_fix_ccomp", rels={"ccomp/xcomp"}),
+    Fixer("_fix_many_subj", rels={"nsubj"}, min_count=2),
+    # Fixer("_fix_left_right_alignments"),
+    # Fixer("_fix_aux_tag", rels={"aux"}),
+    Fixer("_fix_acl_advcl", rels={"acl/advcl"}),
+    Fixer("_fix_aux_tag_rel", rels={"aux"}),
+    Fixer("_fix_advmod_tag", rels={"advmod"}),
+    Fixer("_fix_nummod_tag", rels={"nummod"}),
+    Fixer("_fix_flatname_dep", ctags={"PROPN"}),
+    Fixer("_fix_mark_dep", rels={"mark"}),
+    Fixer("_fix_dep", rels={"rel"}),
+    Fixer("_fix_root_tag", ctags={"AUX"}),
+    Fixer("_fix_head_id_same"),
+    Fixer("_fix_flat_foreign", ctags={"X"}),
+    Fixer("_fix_cconj_rel", ctags={"CCONJ"}),
+    Fixer("_fix_cop_head", rels={"cop"}),
+    Fixer("_fix_appos_lr", rels={"appos"}),
+    Fixer("_fix_cc_tag", rels={"cc"}),
+    Fixer("_fix_cc_rel", rels={"cc"}),
+    Fixer("_fix_zero_dep", rels={"cc"}),
+    Fixer("_fix_conj_rel", rels={"conj"}),
+    Fixer("_fix_punct_rel", ctags={"PUNCT"}),
+    Fixer("_fix_aclrelcl_rel", rels={"acl:relcl"}),
+    Fixer("_fix_punct_heads", rels={"punct"}),
+    Fixer("_fix_dep_rel", rels={"dep"}),
+    # Fixer("_fix_case_rel", rels={"case"}),
+    Fixer("_fix_cc_rel"),
+    Fixer("_fix_head_id_same"),
+    # Fixer("_fix_cop", rels={"cop"}),
+)
+
+
+class FixerStats:
+    """
+    Counts how often each fixer runs, how often it changes the graph and the
+    time spent in it, over all sentences converted in the process.
+    """
+
+    def __init__(self):
+        self.runs = Counter()
+        self.changed = Counter()
+        self.seconds = Counter()
+
+    def add(self, method, seconds, changed):
+        self.runs[method] += 1
+        self.changed[method] += changed
+        self.seconds[method] += seconds
+
+    def report(self):
+        """
+        Returns a table of the fixers, slowest first
+        """
+        lines = [f"{'fixer':<24}{'runs':>8}{'changed':>9}{'ms':>10}{'ms/run':>9}"]
+        for method, seconds in self.seconds.most_common():
+            runs = self.runs[method]
+            lines.append(
+                f"{method:<24}{runs:>8}{self.changed[method]:>9}"
+                f"{seconds * 1000:>10.1f}{seconds * 1000 / runs:>9.3f}"
+            )
+        return "\n".join(lines)
+
+
+fixer_stats = FixerStats()
+
+
 class Converter:
     """
     Converts constituency tree to
@@ -367,92 +692,30 @@ class Converter:
             tree (IndexedCorpusTree): IndexedCorpusTree object to have head selected
         """
 
-        tag = str(tree.label())
-
-        # print(tag)
-
-        # apparently it's better to generalize this over all tags
-        tag = re.sub(r"[=-]\d+", "", tag)
-
-        # # DEBUG:
-        # print(f'Tree: ({tree.label()}), length: {len(tree)}, height: {tree.height()}\n', tree, tag)
-        # input()
-
-        new_rules = []
-        head_rule = head_rules.get(
-            tag, {"dir": "r", "rules": [".*"]}
-        )  # default rule, first from left
-        rules = head_rule["rules"]
-        dir = head_rule["dir"]
-        head = None  # NOTE: er þetta eitthvað?
+        # head rules compiled in lib/rules.py, generalized over all tags
+        # by leaving out the index of the label
+        head_rule = get_head_rule(str(tree.label()))
+        dir = head_rule.dir
 
         if not main_clause:
             main_clause = tree
 
-        # # DEBUG
-        # else:
-        #     print(f'\nMain Clause indicated: {main_clause.label()} \n')
-
-        # # DEBUG:
-        # if tag[:2] == 'IP':
-        #     print(len(head_rule['rules']))
-        # input()
-
         # Somewhat efficient fix for aux verbs
         if tree.num_verbs() == 1 or main_clause.num_verbs() == 1:
-            new_rules[0:0] = rules
-            # new_rules[4:4] = ['BE.*', 'HV.*', 'MD.*', 'RD.*']
-            new_rules[4:4] = ["HV.*", "MD.*", "RD.*"]
-            rules = new_rules
+            matcher = head_rule.one_verb
 
         # TEMP: testing for 3 verb sentences where the 'first' verb is 'vera', e.g. 'En það var eftir að hann var farinn sem mér varð ljóst að ég yrði'
         elif tree.num_verbs() > 2 or main_clause.num_verbs() > 2:
-            # print('\n3 verb sentence\n')
-            new_rules[0:0] = rules
-            new_rules[4:4] = ["IP-INF", "HV.*", "MD.*", "RD.*"]
-            new_rules.append("BE.*")
-            rules = new_rules
+            matcher = head_rule.many_verbs
 
-        # # DEBUG:
-        # print(len(new_rules))
-        # input()
-
-        if dir == "l":
-            rules = reversed(rules)
+        else:
+            matcher = head_rule.matcher
 
         # For catching relation to main clause verb
-
-        # # DEBUG
-        # print('MC:\n',main_clause)
-        # print('Verb num:\n',tree.num_verbs())
-
-        for rule in rules:
-            for child in main_clause:
-
-                try:
-                    if child.height() == 2 and child[0][0] == "*":
-                        continue
-
-                    # # DEBUG:
-                    # print(rule, child.label())
-                    # print(child,'\n')
-
-                    elif re.match(rule, child.label()):
-
-                        # # DEBUG:
-                        # print('Head rules:', rules)
-                        # input()
-
-                        tree.set_id(child.id())
-
-                        # # DEBUG
-                        # print('Head:\n',child)
-                        # input()
-
-                        return
-                except AttributeError:
-                    print(child)
-                    raise
+        head = matcher.select(main_clause)
+        if head is not None:
+            tree.set_id(head.id())
+            return
 
         # no head-rules applicable: select either the first or last child as head
         if len(tree) == 0:
@@ -491,34 +754,8 @@ class Converter:
         :return: str
         """
 
-        mod_tag = re.sub("-TTT", "", mod_tag)
-        mod_tag = re.sub(r"[=-]\d+", "", mod_tag)
-        #'=\d+|
-        mod_tag = re.sub("=XXX|=X", "", mod_tag)
-
-        head_tag = re.sub("-TTT", "", head_tag)
-        head_tag = re.sub(r"[=-]\d+", "", head_tag)
-        #'=\d+|
-        head_tag = re.sub("=XXX|=X", "", head_tag)
-
-        if "+" in mod_tag:
-            mod_tag = re.sub("\w+\+", "", mod_tag)
-        if "+" in head_tag:
-            head_tag = re.sub("\w+\+", "", head_tag)
-
-        if "-" in mod_tag:
-            mod_tag, mod_func = mod_tag.split(
-                "-", 1
-            )  # todo, handle more than one function label
-        else:
-            mod_func = None
-
-        if "-" in head_tag:
-            head_tag, head_func = head_tag.split("-", 1)
-        else:
-            head_func = None
-
-        return determine_relations(mod_tag, mod_func, head_tag, head_func)
+        # labels split into tags and functions, memoized by label pair
+        return resolve_relation(mod_tag, head_tag)
 
     def _get_tag_dict(self, tree):
         if self.auto_tags == "single_sentence":
@@ -527,11 +764,7 @@ class Converter:
                     "\$ \$",
                     "",
                     " ".join(
-                        [
-                            tree[i].split("-")[0]
-                            for i in tree.treepositions()
-                            if isinstance(tree[i], str)
-                        ]
+                        [leaf.split("-")[0] for leaf in tree.leaves()]
                     ),
                 )
                 tag_pairs = Features.tagged_sent(text)
@@ -555,6 +788,15 @@ class Converter:
     #             self.dg.get_by_adress(adress).update({"rel": "det"})
     #             self.dg.get_by_adress(adress + 1).update({"rel": "compound"})
 
+    def _run_fixer(self, method):
+        """
+        Runs a fixer method on the graph, recording it in fixer_stats
+        """
+        changes = self.dg.nodes.changes
+        start = perf_counter()
+        getattr(self, method)()
+        fixer_stats.add(method, perf_counter() - start, self.dg.nodes.changes != changes)
+
     def _fix_root_relation(self):
         """09.03.20
         Fixes buggy root relations in filled out sentence graph by checking
@@ -680,57 +922,53 @@ class Converter:
                 # print('\nccomp/xcomp error node:')
                 # print(address, node)
 
-                for other_address, other_node in self.dg.nodes.items():
-                    # check if nsubj node has ccomp/xcomp node as head
-                    if other_node["head"] == address and other_node["rel"] == "nsubj":
+                # the head of the error node, if it is in the graph
+                head_node = self.dg.nodes.get(node["head"])
+                if head_node is not None and head_node["address"] != node["head"]:
+                    head_node = None
+                head_is_clause = (
+                    head_node is not None
+                    and self.dg.get_by_address(head_node["head"])["ctag"]
+                    in {"AUX", "VERB"}
+                )
 
-                        # # DEBUG:
-                        # print('\n=> check for nsubj relation to error node\n')
-                        # print(other_address, other_node)
-                        # input()
+                # check if nsubj node has ccomp/xcomp node as head
+                if any(
+                    other_node["rel"] == "nsubj"
+                    for other_node in self.dg.dependents(address)
+                ):
+                    self.dg.get_by_address(address).update({"rel": "ccomp"})
+                    continue
 
+                if head_is_clause:
+                    # checks if error node head is verb and whether that verb has a nsubj node attached
+                    # NOTE: likely be too greedy
+                    if any(
+                        other_other_node["rel"] == "nsubj"
+                        for other_other_node in self.dg.dependents(
+                            head_node["head"]
+                        )
+                    ):
                         self.dg.get_by_address(address).update({"rel": "ccomp"})
-                    elif other_node["address"] == node[
-                        "head"
-                    ] and self.dg.get_by_address(other_node["head"])["ctag"] in {
-                        "AUX",
-                        "VERB",
-                    }:
-                        # checks if error node head is verb and whether that verb has a nsubj node attached
-                        # NOTE: likely be too greedy
-                        for (
-                            other_other_address,
-                            other_other_node,
-                        ) in self.dg.nodes.items():
-                            if (
-                                other_other_node["head"] == other_node["head"]
-                                and other_other_node["rel"] == "nsubj"
-                            ):
-
-                                # # DEBUG:
-                                # print('\n=> check if error node head is verb and verb has nsubj\n')
-                                # print(other_address, other_node)
-                                # print(other_other_address, other_other_node)
-                                # input()
+                        continue
 
-                                self.dg.get_by_address(address).update({"rel": "ccomp"})
-                    elif (
-                        other_node["head"] == node["head"]
-                        and other_node["rel"] == "nsubj"
+                for other_node in self.dg.dependents(node["head"]):
+                    if other_node["rel"] != "nsubj" or (
+                        head_is_clause and other_node["address"] == node["head"]
                     ):
-
-                        if other_node["ctag"] == "PRON" and re.search(
-                            "(-A|-D|-G)", other_node["tag"]
-                        ):
-                            # accusative and dative pronouns as subject may indicate no real subject, thus xcomp relation
-                            # print('\n=> MAYBE NOT TOO GREEDY? (xcomp)')
-                            # self.dg.get_by_address(address).update({'rel': 'xcomp'})
-                            continue
-                        else:
-                            # This chould also be ccomp but is too greedy
-                            # print('\n=> TOO GREEDY\n')
-                            self.dg.get_by_address(address).update({"rel": "ccomp"})
-                            # continue
+                        continue
+                    if other_node["ctag"] == "PRON" and re.search(
+                        "(-A|-D|-G)", other_node["tag"]
+                    ):
+                        # accusative and dative pronouns as subject may indicate no real subject, thus xcomp relation
+                        # print('\n=> MAYBE NOT TOO GREEDY? (xcomp)')
+                        # self.dg.get_by_address(address).update({'rel': 'xcomp'})
+                        continue
+                    else:
+                        # This chould also be ccomp but is too greedy
+                        # print('\n=> TOO GREEDY\n')
+                        self.dg.get_by_address(address).update({"rel": "ccomp"})
+                        break
 
                 # else:
                 #     print('\n=> NO FIX\n')
@@ -797,15 +1035,14 @@ class Converter:
                     # # DEBUG
                     # print('=> Head seems to be nominal\n', self.dg.get_by_address(address))
 
-                    for other_address, other_node in self.dg.nodes.items():
-                        if (
-                            other_node["head"] == node["head"]
-                            and other_node["rel"] == "cop"
-                        ):
-                            self.dg.get_by_address(address).update({"rel": "advcl"})
-                        # Should have acl relation if not caught above
-                        else:
-                            self.dg.get_by_address(address).update({"rel": "acl"})
+                    if any(
+                        other_node["rel"] == "cop"
+                        for other_node in self.dg.dependents(node["head"])
+                    ):
+                        self.dg.get_by_address(address).update({"rel": "advcl"})
+                    # Should have acl relation if not caught above
+                    else:
+                        self.dg.get_by_address(address).update({"rel": "acl"})
                 # All cases not yet caught ~should~ have relation acl
                 else:
                     self.dg.get_by_address(address).update({"rel": "acl"})
@@ -820,12 +1057,10 @@ class Converter:
             for address, node in self.dg.nodes.items():
                 if node["ctag"] == "PUNCT":
                     if address + 1 not in self.dg.nodes:
-                        if (
-                            self.dg.root_address() != None
-                            and address > self.dg.root_address()
-                        ):
+                        root_address = self.dg.root_address()
+                        if root_address != None and address > root_address:
                             self.dg.get_by_address(address).update(
-                                {"head": self.dg.root_address()}
+                                {"head": root_address}
                             )
                         else:
                             self.dg.get_by_address(address).update(
@@ -945,14 +1180,9 @@ class Converter:
 
                     if node["head"] == 0:
                         # If the punctuation is the root of the sentence, which is not allowed
-                        for otheraddress, othernode in self.dg.nodes.items():
-                            if othernode["head"] == address:
-                                self.dg.get_by_address(otheraddress).update(
-                                    {"head": address + 1}
-                                )
-                            self.dg.get_by_address(address).update(
-                                {"head": address + 1}
-                            )
+                        for othernode in self.dg.dependents(address):
+                            othernode.update({"head": address + 1})
+                        self.dg.get_by_address(address).update({"head": address + 1})
 
                     if node["rel"] != "punct":
                         self.dg.get_by_address(address).update({"rel": "punct"})
@@ -1841,21 +2071,25 @@ class Converter:
         else:
             self.dg.original_ID = t.corpus_id
 
-        for i in t.treepositions():
-            if isinstance(t[i], Tree):
+        # all nodes of the tree, read in one traversal
+        nodes = t.node_table()
+
+        for node in nodes:
+            if not node.is_leaf:
+                subtree = node.tree
 
-                if len(t[i]) == 1:
+                if len(subtree) == 1:
                     # If terminal node with label or tree with single child
                     # e.g. (VBDI tók-taka) or (NP-SBJ (PRO-N hann-hann))
-                    tag_list[nr] = t[i].label()
-                    t[i].set_id(nr)
-                    # print(t[i],'\n', t[i].height(), len(t[i]))
+                    tag_list[nr] = node.label
+                    subtree.set_id(nr)
+                    # print(subtree,'\n', subtree.height(), len(subtree))
                 else:
-                    # print(t[i])
+                    # print(subtree)
                     # If constituent / complex phrase
                     # e.g. (ADVP (ADV smám-smám) (ADV saman-saman))
-                    t[i].set_id(0)
-                    const.append(i)
+                    subtree.set_id(0)
+                    const.append(node)
 
                     # for adress, node in self.dg.nodes.items():
                     #     if node["word"] == '0':
@@ -1863,12 +2097,14 @@ class Converter:
 
             else:
 
+                leaf = node.tree
+
                 # If trace node, skip (preliminary, may result in errors)
                 # e.g. *T*-3 etc.
 
                 # if self.
                 
-                if t[i][0] in {
+                if leaf[0] in {
                     "0",
                     "*",
                     "{",
@@ -1876,22 +2112,22 @@ class Converter:
                 }:  # if t[1].pos()[0][0] in {'0', '*'}:
                     continue
 
-                if "---" in t[i]:
+                if "---" in leaf:
                     FORM = LEMMA = "-"
                     # tag = tag_list[nr]
 
-                elif "^" in t[i]:
+                elif "^" in leaf:
                     # if leaf is for whatever reason a single symbol with no
                     # hyphen treat seperately
-                    if len(t[i]) == 1:
+                    if len(leaf) == 1:
                         FORM = LEMMA = tag = tag_list[nr]
                     # If terminal node with no label (token-lemma)
                     # e.g. tók-taka
                     else:
-                        FORM = decode_escaped(t[i].split("^", 1)[0])
-                        LEMMA = decode_escaped(t[i].split("^", 1)[1])
+                        FORM = decode_escaped(leaf.split("^", 1)[0])
+                        LEMMA = decode_escaped(leaf.split("^", 1)[1])
                         # tag = tag_list[nr]
-                elif t[i][0] in {
+                elif leaf[0] in {
                     "<dash/>",
                     "<dash>",
                     "</dash>",
@@ -1899,7 +2135,7 @@ class Converter:
                     FORM = LEMMA = "^"
                     # tag = tag_list[nr]
                 else:  # If no lemma present
-                    FORM = decode_escaped(t[i])
+                    FORM = decode_escaped(leaf)
                     LEMMA = None
                 tag = tag_list[nr]
                 if "+" in tag:
@@ -1918,7 +2154,6 @@ class Converter:
                     tag = re.sub("-TTT", "", tag)
                 # token_lemma = str(FORM+'-'+LEMMA)
                 XPOS = tag
-                MISC = defaultdict(lambda: None)
                 # Feature Classes called here
                 if self.faroese:
                     UPOS = Features.get_UD_tag(tag, True)
@@ -1944,8 +2179,8 @@ class Converter:
                     FEATS = Features(ifd_tag).features
                     MISC = defaultdict(lambda: None, {"IFD_tag": ifd_tag})
                 else:
-                    FEATS = PPCHY_Features(tag).get_features()
-                    MISC = defaultdict(lambda: None)
+                    FEATS = PPCHY_Features.features_for(tag)
+                    MISC = None  # created when first read
                 if FORM not in {"None", None}:
                     self.dg.add_node(
                         {
@@ -1955,7 +2190,6 @@ class Converter:
                             "ctag": UPOS,  # upostag
                             "tag": XPOS,  # xpostag
                             "feats": FEATS,
-                            "deps": defaultdict(list),
                             "rel": "_",
                             "misc": MISC,
                         }
@@ -1965,15 +2199,27 @@ class Converter:
         # # DEBUG:
         # print(tag_list)
 
-        # trees with single child
+        # trees with single child, in the order of a set of their positions
+        # as the heads set below depend on it
+        by_position = {node.position: node for node in nodes}
         singles = [
-            i
-            for i in set(t.treepositions()).difference(const)
-            if isinstance(t[i], Tree)
+            by_position[i]
+            for i in set(by_position).difference(node.position for node in const)
+            if not by_position[i].is_leaf
         ]
 
         # go through the constituencies (bottom up) and find their heads
-        const.sort(key=lambda x: len(x), reverse=True)
+        const.sort(key=lambda node: node.depth, reverse=True)
+
+        # constituents by the end of their label, so that a reference to a
+        # coindexed clause (e.g. IP-MAT=1 for IP-MAT-1, gapping and
+        # coordination) is found without scanning the tree
+        const_by_index = defaultdict(list)
+        for node in const:
+            const_by_index[node.label[-2:]].append(node)
+        by_index = defaultdict(list)
+        for node in const + singles:
+            by_index[node.label[-2:]].append(node)
 
         # # DEBUG:
         # print(t.tags())
@@ -1981,74 +2227,74 @@ class Converter:
         # input()
 
         # head selection
-        for i in const:
+        for node in const:
+            subtree = node.tree
 
             # # DEBUG:
-            # print(i, t[i], t[i].label(), len(t[i]))
+            # print(node.position, subtree, node.label, len(subtree))
             # input()
 
             # Catch index referenced sentences in treebank
-            if re.match("=\d", t[i].label()[-2:]):  # or t[i].label() == 'CONJP
-                clause_index = t[i].label()[-1]
-                # re.match('\d', t[i].label()[-2:])
-                for j in const + singles:
-                    if re.match(f"-{clause_index}", t[j].label()[-2:]):
-                        if isinstance(t[j][0], str):
-                            t[i].set_id(t[j].id())
-                        else:
-                            self._select_head(t[i], main_clause=t[j])
+            if re.match("=\d", node.label[-2:]):  # or node.label == 'CONJP
+                clause_index = node.label[-1]
+                # re.match('\d', node.label[-2:])
+                for other in by_index.get(f"-{clause_index}", ()):
+                    if isinstance(other.tree[0], str):
+                        subtree.set_id(other.tree.id())
+                    else:
+                        self._select_head(subtree, main_clause=other.tree)
 
             else:
-                self._select_head(t[i])
+                self._select_head(subtree)
 
         # fixes subtrees with 1 child but wrong id
-        for i in singles:
-            if isinstance(t[i][0], Tree) and t[i].id() != t[i][0].id():
+        for node in singles:
+            subtree = node.tree
+            if isinstance(subtree[0], Tree) and subtree.id() != subtree[0].id():
 
                 # # DEBUG:
                 # print()
-                # print('Tree ID:', t[i].id(), 'Child ID:', t[i][0].id())
-                # print('Tree:', t[i])
+                # print('Tree ID:', subtree.id(), 'Child ID:', subtree[0].id())
+                # print('Tree:', subtree)
                 # # print()
-                # print('Child:', t[i][0])
+                # print('Child:', subtree[0])
 
-                if re.match("=\d", t[i].label()[-2:]):
+                if re.match("=\d", node.label[-2:]):
                     # print('\nMain Clause indicated\n')
-                    clause_index = t[i].label()[-1]
-                    # re.match('\d', t[i].label()[-2:])
-                    for j in const:
-                        if re.match(f"-{clause_index}", t[j].label()[-2:]):
-                            self._select_head(t[i][0], main_clause=t[j])
+                    clause_index = node.label[-1]
+                    # re.match('\d', node.label[-2:])
+                    for other in const_by_index.get(f"-{clause_index}", ()):
+                        self._select_head(subtree[0], main_clause=other.tree)
                 # else
                 else:
-                    t[i].set_id(t[i][0].id())
+                    subtree.set_id(subtree[0].id())
 
-                # print('Tree ID:', t[i].id(), 'Child ID:', t[i][0].id())
+                # print('Tree ID:', subtree.id(), 'Child ID:', subtree[0].id())
 
         # runs various subtrees that are likely to have root errors after
         # last block back through head selection
-        for i in const:
+        for node in const:
             if re.match(
-                "(IP-MAT|IP-SUB-SPE|FRAG|QTP|IP-IMP|CONJP|META|LATIN)", t[i].label()
+                "(IP-MAT|IP-SUB-SPE|FRAG|QTP|IP-IMP|CONJP|META|LATIN)", node.label
             ):
-                self._select_head(t[i])
-                # if re.match('IP-MAT', t[i].label()):
+                self._select_head(node.tree)
+                # if re.match('IP-MAT', node.label):
                 #    self.dg.original_phrase_tag = 'IP-MAT'
 
-        for i in list(set(t.treepositions()).difference(const)):
-            if isinstance(t[i][0], Tree) and t[i].label() == "CONJP":
-                t[i].set_id(t[i][0].id())
+        for node in singles:
+            if isinstance(node.tree[0], Tree) and node.label == "CONJP":
+                node.tree.set_id(node.tree[0].id())
 
         # relations set
-        for i in const:
+        for node in const:
 
-            head_tag = t[i].label()
-            head_nr = t[i].id()
+            head_tag = node.label
+            head_nr = node.tree.id()
 
             # if re.search(r'\w{1,5}(21|22|31|32|33)', head_tag):
             head_tag = re.sub("(21|22|31|32|33)", "", head_tag)
 
-            for child in t[i]:
+            for child in node.tree:
 
                 # block to catch explatives inside e.g. NP-SBJ nodes
                 if (
@@ -2123,63 +2369,14 @@ class Converter:
             # print(self.dg.to_conllU())
             # input()
 
-            self._fix_root_relation()
-
-        rel_counts = self.dg.rels()
-        ctag_counts = self.dg.ctags()
-
-        if rel_counts["ccomp/xcomp"] > 0:
-            self._fix_ccomp()
-        if rel_counts["nsubj"] > 1:
-            self._fix_many_subj()
-
-        ##self._fix_left_right_alignments()
-
-        ## if rel_counts['aux'] > 0:
-        ##     self._fix_aux_tag()
-        if rel_counts["acl/advcl"] > 0:
-            self._fix_acl_advcl()
-        if rel_counts["aux"] > 0:
-            self._fix_aux_tag_rel()
-        if rel_counts["advmod"] > 0:
-            self._fix_advmod_tag()
-        if rel_counts["nummod"] > 0:
-            self._fix_nummod_tag()
-        if ctag_counts["PROPN"] > 0:
-            self._fix_flatname_dep()
-        if rel_counts["mark"] > 0:
-            self._fix_mark_dep()
-        if rel_counts["rel"] > 0:
-            self._fix_dep()
-        if ctag_counts["AUX"] > 0:
-            self._fix_root_tag()
-        self._fix_head_id_same()
-        if ctag_counts["X"] > 0:
-            self._fix_flat_foreign()
-        if ctag_counts["CCONJ"] > 0:
-            self._fix_cconj_rel()
-        if rel_counts["cop"] > 0:
-            self._fix_cop_head()
-        if rel_counts["appos"] > 0:
-            self._fix_appos_lr()
-        if rel_counts["cc"] > 0:
-            self._fix_cc_tag()
-            self._fix_cc_rel()
-            self._fix_zero_dep()
-        if rel_counts["conj"] > 0:
-            self._fix_conj_rel()
-        if ctag_counts["PUNCT"] > 0:
-            self._fix_punct_rel()
-        if rel_counts["acl:relcl"] > 0:
-            self._fix_aclrelcl_rel()
-        if rel_counts["punct"] > 0:
-            self._fix_punct_heads()
-        if rel_counts["dep"] > 0:
-            self._fix_dep_rel()
-        # if rel_counts["case"] > 0:
-        #    self._fix_case_rel()
-        self._fix_cc_rel()
-        self._fix_head_id_same()
+            self._run_fixer("_fix_root_relation")
+
+        rel_counts = Counter(self.dg.rels())
+        ctag_counts = Counter(self.dg.ctags())
+        for fixer in FIXERS:
+            if fixer.triggered(rel_counts, ctag_counts):
+                self._run_fixer(fixer.method)
+
         # self._fix_apor()
         if self.dg.num_roots() != 1:
 
@@ -2187,15 +2384,12 @@ class Converter:
             # print(self.dg.to_conllU())
             # input()
 
-            self._fix_root_relation()
+            self._run_fixer("_fix_root_relation")
 
         # DEBUG:
         # if self.dg.get_by_address(len(self.dg.nodes)-1)['word'] == None:
         #     self._fix_empty_node()
 
-        # if rel_counts['cop'] > 0:
-        #     self._fix_cop()
-
         return self.dg
 
     @staticmethod
@@ -2310,6 +2504,9 @@ class Converter:
         #    if len(root_phrases) > 0:
         #        new_dg = root_phrases[0]
         #    if new_dg.original_phrase_tag == 'IP-MAT':
+        # root of the joined graph, None if the first graph has none (e.g. when
+        # its heads form a cycle), then the root of the next graph is used
+        new_root = None
         for node in new_dg.nodes.values():
             if node["head"] == 0:
                 new_root = node["address"]
@@ -2333,6 +2530,8 @@ class Converter:
                 else:
                     node.update({"address": new_id})
                 new_id += 1
+            if new_root is None and old_root is not None:
+                new_root = old_new_addresses[old_root]
             for node in old_dg.nodes.values():
                 if (
                     node["address"] == 0
@@ -2340,7 +2539,9 @@ class Converter:
                     or node["word"] in {"None", None}
                 ):
                     continue
-                if node["head"] == 0:
+                if node["head"] == 0 and node["address"] == new_root:
+                    pass
+                elif node["head"] == 0:
                     node.update(
                         {"head": new_root, "rel": "conj", "misc": {"OriginalHead": "0"}}
                     )
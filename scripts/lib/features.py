@@ -16,8 +16,9 @@ import string
 import requests
 
 from collections import defaultdict
+from types import MappingProxyType
 
-from lib.rules import UD_map, PPCHY_feats # took out OTB_map
+from lib.rules import UD_map, UD_prefix_map, PPCHY_feats # took out OTB_map
 from lib.tools import decode_escaped
 class Features:
     """ """
@@ -122,34 +123,43 @@ class Features:
 
     @staticmethod
     def get_UD_tag(tag, faroese):
-        """ """
+        """
+        Returns the UD tag (UPOS) of a tag, looked up in UPOS_table, where
+        tags are added as they come up
+        """
+        if faroese:
+            return Features._resolve_UD_tag(tag, faroese)
+        UPOS = UPOS_table.get(tag)
+        if UPOS is None:
+            UPOS = UPOS_table[tag] = Features._resolve_UD_tag(tag, faroese)
+        return UPOS
+
+    @staticmethod
+    def _resolve_UD_tag(tag, faroese):
+        """
+        Finds the UD tag of a tag by the part before the first hyphen, from
+        UD_map, UD_prefix_map or the punctuation, 'X' if none applies
+        """
         if "-" in tag:
             tag = tag.split("-")[0]
-        try:
-            tag = UD_map[tag]
-            return tag
-        except:
-            # raise
-            if re.search(r"(DO|DA|RD|RA)", tag[0:2]):
-                tag = "VERB"  # ATH. merkt sem sögn í bili
-                return tag
-            elif re.search(r"(BE|BA|HV|HA|MD|MA)", tag[0:2]):
-                tag = "AUX"
-                return tag
-            elif tag == "CONJ":
-                tag = "CCONJ"
-                return tag
-            elif tag in string.punctuation:
-                tag = "PUNCT"
-                return tag
-            else:
-                if faroese:
-                    tag = fo_rules.UD_map.get(tag[0:3], "X")
-                else:
-                    tag = UD_map.get(tag[0], "X")
-                return tag
-            
-            
+        if tag in UD_map:
+            return UD_map[tag]
+        elif tag[0:2] in UD_prefix_map:
+            return UD_prefix_map[tag[0:2]]
+        elif tag == "CONJ":
+            return "CCONJ"
+        elif tag in string.punctuation:
+            return "PUNCT"
+        elif faroese:
+            return fo_rules.UD_map.get(tag[0:3], "X")
+        else:
+            return UD_map.get(tag[0], "X")
+
+
+# tag -> UD tag, starting with UD_map, see Features.get_UD_tag()
+UPOS_table = dict(UD_map)
+
+
 class FeatureExtractionError(Exception):
     """docstring for ."""
 
@@ -167,7 +177,16 @@ class FeatureExtractionError(Exception):
 
 
 class PPCHY_Features:
-    
+    """
+    UD features of a PPCHY PoS tag (XPOS), see get_features()
+
+    The features only depend on the tag, so they are computed once per tag
+    with features_for(), which is what the converter uses.
+    """
+
+    # tag -> read-only features (or None), filled as new tags come up
+    _memo = {}
+
     def __init__(self, tag):
         self.tag = tag
         self.features = {}
@@ -204,7 +223,6 @@ class PPCHY_Features:
             if tag.startswith("W") and len(tag) > 4:
                 self.features["Degree"] = PPCHY_feats["ADJ"]["Degree"][tag[4]]
             elif not tag.startswith("W"):
-                print(tag)
                 self.features["Degree"] = PPCHY_feats["ADJ"]["Degree"][""]
         else:
             self.features["Degree"] = PPCHY_feats["ADJ"]["Degree"][""]
@@ -233,7 +251,6 @@ class PPCHY_Features:
         if "-" in tag:
             tag, morph = tag.split("-", 1)
             if "-" in morph:
-                print(morph)
                 case = morph.split("-")[0]
                 polarity = morph.split("-")[1]
                 if polarity == "NEG":
@@ -405,3 +422,19 @@ class PPCHY_Features:
             return self._es_features(self.tag)
         else:
             return self._other_features(self.tag)
+
+    @classmethod
+    def features_for(cls, tag):
+        """
+        Returns the features of a tag like get_features(), as a read-only
+        mapping shared by all tokens with the tag. Tags that raise errors
+        are not memoized.
+        """
+        try:
+            return cls._memo[tag]
+        except KeyError:
+            features = cls(tag).get_features()
+            if features is not None:
+                features = MappingProxyType(features)
+            cls._memo[tag] = features
+            return features
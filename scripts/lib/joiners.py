@@ -14,31 +14,269 @@ import re
 import sys
 import os
 from datetime import datetime
+from time import perf_counter
 from collections import defaultdict
 import pyconll
 
+# Patterns are compiled once here and shared by all NodeJoiner instances,
+# grouped by the NodeJoiner method using them
+
 # took out adverbs for the moment, I am not sure what to do with those yet
 # they seem to crash
-PARTICLE_NODE = r"\((P|RP.*|Q-.|ADVR?|PRO-.|ONE\+Q-.|OTHER-.|WD-.|RP-.*|TO) [A-Za-z]+\@\)"
-PARTICLE_TOKEN = r"(?<= )[A-Za-z]+(?=\@)"
+PARTICLE_NODE = re.compile(r"\((P|RP.*|Q-.|ADVR?|PRO-.|ONE\+Q-.|OTHER-.|WD-.|RP-.*|TO) [A-Za-z]+\@\)")
+PARTICLE_TOKEN = re.compile(r"(?<= )[A-Za-z]+(?=\@)")
 
-PARTICLE_MIDDLE_NODE = r"\(TO \@[a-z]+\@\)"
-PARTICLE_MIDDLE_TOKEN = r"(?<= )\@[A-Za-z]+(?=\@)"
-PARTICLE_START = r"(?<= )\@(?=[A-Za-z])"
+PARTICLE_MIDDLE_NODE = re.compile(r"\(TO \@[a-z]+\@\)")
+PARTICLE_MIDDLE_TOKEN = re.compile(r"(?<= )\@[A-Za-z]+(?=\@)")
+PARTICLE_START = re.compile(r"(?<= )\@(?=[A-Za-z])")
 
-VERB_NODE = r"\((BE|DO|HV|MD|RD|V(A|B))(P|D|N|F|)(I|S|N|G|F|)(-(N|A|D|G))? \@[A-Za-z]+\)"
-VERB_START = r"(?<=[A-Z] )\@(?=[A-Za-z])"  # matches '@' in start of verb
-VERB_TOKEN = r"(?<=\@)[a-zA-Z]+"
-VERB_TAG = r"(?<=\()(BE|DO|HV|MD|RD|V(A|B))(P|D|N|F|)(I|S|N|G|F|)(-(N|A|D|G))?"
+VERB_NODE = re.compile(r"\((BE|DO|HV|MD|RD|V(A|B))(P|D|N|F|)(I|S|N|G|F|)(-(N|A|D|G))? \@[A-Za-z]+\)")
+VERB_START = re.compile(r"(?<=[A-Z] )\@(?=[A-Za-z])")  # matches '@' in start of verb
+VERB_TOKEN = re.compile(r"(?<=\@)[a-zA-Z]+")
+VERB_TAG = re.compile(r"(?<=\()(BE|DO|HV|MD|RD|V(A|B))(P|D|N|F|)(I|S|N|G|F|)(-(N|A|D|G))?")
 
-LEMMA_START_GENERAL = (
+LEMMA_START_GENERAL = re.compile(
     r"((?<=[a-z]-)(?=[a-z]))"  # MATCHES START OF LEMMA
     )
-LEMMA_TOKEN_GENERAL = r"(?<=-)[a-z]+(?=\)\))"
-LEMMA_END_GENERAL = (
+LEMMA_TOKEN_GENERAL = re.compile(r"(?<=-)[a-z]+(?=\)\))")
+LEMMA_END_GENERAL = re.compile(
     r"(?<=[A-Za-z])(?=\))"  # matches end of lemma
     )
 
+ADVPDIR_NODE = re.compile(r"\(ADVP-DIR \)")
+
+# remove_punctuation
+COMMA_NODE = re.compile(r"\(PUNC ,\)(?!\))")
+
+# assign_definiteness
+DN_NODE = re.compile(r"\(NP.*\(D.*\(N")
+D_NODE = re.compile(r"\(D [a-z]*\)(?!\))")
+N_NODE = re.compile(r"(N[^P]{0,4})(?: )")
+#NP-EXPL make this not work, hardcoded for the moment
+NPEXPL_NODE = re.compile(r"\(NP-EXPL")
+Dend_NODE = re.compile(r"\(D.*\)\)\n")
+ADJPPRO_NODE = re.compile(r"\(ADJP \(PRO\$")
+Nnwl_TAG = re.compile(r"(?<=\()N[^P]{0,4}(?= )")
+D_TOKEN = re.compile(r"(?:\bD.{0,4} )(\w+)+")
+N_TAG = re.compile(r"(?:\(NP.*\(D.*\()(N.{0,4})(?: )")
+
+# TODO: look at the contracted forms with @
+DEFINITES = {"der", "di", "dem", "dos", "den", "das", "dr",
+             "ds", "eyner", "yener", "daz", "dz", "yenem",
+             "yene", "di_dozike", "dus", "yens", "dizn", "des",
+             "der_doziker", "die", "didozike", "dizr", "dis",
+             "doz", "dizir", "dizh", "dizs"}
+
+INDEFINITES = {"a", "eyn", "an", "ayn", "eyne", "ayner", "in", "aynem"}
+
+# assign_reflexive
+rflNP_NODE = re.compile(r"\(NP-RFL \(PRO")
+rflPRO_TAG = re.compile(r"(?<=NP-RFL \()PRO")
+
+# join_adverbs
+negADV_NODE = re.compile(r"\(ADV @o(?=\)\))")
+NEG_NODE = re.compile(r"\(NEG [a-z]+@\)")
+NEG_TOKEN = re.compile(r"(?<=\(NEG )[a-z]+(?=@)")
+
+# assign_case
+NPcased_NODE = re.compile(r"\(NP-.{3}(?!.*(\*))")# the star is preliminary
+NPinNP_NODE = re.compile(r"\(NP-.{3} \(NP.*")
+embNP_NODE = re.compile(r"(?<=\(NP-.{3} \()NPR?(?=\s)")
+NPcaseless_TAG = re.compile(r"(?<=\()NPR?")
+NPcased_TAG = re.compile(r"(?<=\()NP-.{3}")
+RSPNPcased_TAG = re.compile(r"(?<=\()NP-.{3}-RSP")
+CAT_TAG = re.compile(r"(?<=\()NP(?=-.{3})")
+CASE_INFO = re.compile(r"(?<=\(NP-)(SBJ|ACC|DTV|GEN|LGS)")
+complexNP_NODE = re.compile(r"(?<=\(NP-.{3} \()(?<!\w)(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)(?=\s)")
+
+SMCSUBJ_NODE = re.compile(r"\(IP-SMC \(NP-SBJ.*\)")
+
+CONJP_NODE = re.compile(r"\(CONJP.*")
+
+RSPNP_NODE = re.compile(r"NP-.{3}-RSP")
+RSPCASE_INFO = re.compile(r"(?<=\(NP-)(SBJ|ACC|DTV|GEN|LGS)(?=-RSP)")
+complexRSPNP_NODE = re.compile(r"(?<=\(NP-.{3}-RSP \()(?<!\w)(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)(?=\s)")
+
+QPD_NODE = re.compile(r"\(NP-(SBJ|ACC|DTV|GEN) \(QP \(D")
+D_TAG = re.compile(r"\(D")
+ADVNP_NODE = re.compile(r"\(NP-(SBJ|ACC|DTV|GEN) \(ADV [a-z]*\) \([A-Z]*")
+GOAL_TAG = re.compile(r"(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)(?=\s)")
+
+CASE_DICT = {
+    "ACC": "OB1",
+    "DTV": "OB2",
+    "LGS": "SBJ",
+    "GEN": "GEN",
+    }
+
+# case_concord_one_line
+PROBE_NODE = re.compile(r"\(\b(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)\b-.{3}(?!.*(\*))")
+PROBE_CASE = re.compile(r"\(\b(?:PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)\b-(NOM|ACC|DTV)")
+GOAL_NODE = re.compile(r"(?<!\w)(PRO\$|PRO|Q(?!\spor)|NUM|N|ADJ|ADJR|ADJS|D)(?=\s)")
+PROd_TAG = re.compile(r"PRO\$")
+
+# case_concord_conjunction
+PROBEconj_NODE = re.compile(r"\(\b(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D|QP)\b-.{3}(?!.*(\*))")
+PROBEconj_CASE = re.compile(r"\(\b(?:PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D|QP)\b-(NOM|ACC|DTV)")
+GOALconj_NODE = re.compile(r"(?<!\w)(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D|QP)(?=\s)")
+Q_NODE = re.compile(r"\(Q\s")
+NPclosed_NODE = re.compile(r"\(NP.*\)\)")
+
+# join_preposition_determiner
+Psep_NODE = re.compile(r"\(PP \(P .*\@\)")
+P_TAG = re.compile(r"(?<=\(PP \()P(?= )")
+P_TOKEN_at = re.compile(r"(?<=\(P-CL )[a-z]+\@(?=\))")
+P_TOKEN = re.compile(r"(?<=\(P-CL )[a-z]+(?=\@\))")
+Dcl_NODE = re.compile(r"(?<=\(NP )\(D @[a-z]+\)")
+Dcl_TOKEN = re.compile(r"(?<=\(NP \(D @)[a-z]+(?=\))")
+
+# delete_case_stacking
+CASEstack_NODE = re.compile(r"(?:-NOM){2,}|(?:-ACC){2,}|(?:-DTV){2}")
+
+# Declarations of the NodeJoiner rules run by RulePipeline
+#   window: first and last line the rule reads or changes, relative to the
+#       current line, at most 3 lines
+#   prefilter: literal strings by line offset, a rule only changes anything if
+#       each of these lines contains one of its strings, so it is skipped for
+#       all other lines without running its regular expressions
+RULES = {
+    "remove_punctuation": {
+        "window": (0, 0),
+        "prefilter": {0: ("(PUNC ,)",)},
+    },
+    "join_verbs_same_line": {
+        "window": (0, 0),
+        "prefilter": {0: ("@",)},
+    },
+    "join_verbs_two_lines": {
+        "window": (-1, 0),
+        "prefilter": {0: ("@",), -1: ("@",)},
+    },
+    "join_verbs_three_lines": {
+        "window": (-2, 0),
+        "prefilter": {0: ("@",), -1: ("@",), -2: ("@",)},
+    },
+    "join_adverbs": {
+        "window": (0, 1),
+        "prefilter": {0: ("(NEG ",), 1: ("(ADV @o",)},
+    },
+    "assign_reflexive": {
+        "window": (0, 0),
+        "prefilter": {0: ("(NP-RFL",)},
+    },
+    "assign_case": {
+        "window": (0, 2),
+        "prefilter": {0: ("NP-",)},
+    },
+    "case_concord_one_line": {
+        "window": (0, 0),
+        "prefilter": {0: ("-NOM", "-ACC", "-DTV")},
+    },
+    "case_concord_conjunction": {
+        "window": (0, 1),
+        "prefilter": {0: ("-NOM", "-ACC", "-DTV")},
+    },
+    "assign_definiteness": {
+        "window": (0, 1),
+        "prefilter": {0: ("(D",)},
+    },
+    "join_preposition_determiner": {
+        "window": (0, 1),
+        "prefilter": {0: ("(PP (P ",), 1: ("(NP (D @",)},
+    },
+    "delete_case_stacking": {
+        "window": (0, 0),
+        "prefilter": {0: ("-NOM-NOM", "-ACC-ACC", "-DTV-DTV")},
+    },
+}
+
+
+class RulePipeline:
+    """
+    Runs a list of NodeJoiner rules over the lines of a NodeJoiner in a single
+    pass. For every line the rules are run in the given order, each on the
+    window of lines it declares in RULES, so the result is the same as calling
+    each rule for every index in turn. A rule is skipped for a line if its
+    prefilter does not match, checked right before the rule would run, as
+    earlier rules may have changed the lines.
+
+    Args:
+        rules (list): names of NodeJoiner methods declared in RULES
+        stats (bool): count calls and hits (calls changing any line in the
+            window of the rule) and time each rule, see report()
+    """
+
+    def __init__(self, rules, stats=False):
+        for rule in rules:
+            if rule not in RULES:
+                raise ValueError(f"No declaration for rule {rule} in RULES")
+            first, last = RULES[rule]["window"]
+            if last - first > 2:
+                raise ValueError(f"Window of rule {rule} wider than 3 lines")
+        self.rules = rules
+        # literals of each line searched for in one go
+        self.prefilters = {
+            rule: [
+                (offset, re.compile("|".join(map(re.escape, literals))).search)
+                for offset, literals in RULES[rule]["prefilter"].items()
+            ]
+            for rule in rules
+        }
+        self.stats = stats
+        self.calls = defaultdict(int)
+        self.hits = defaultdict(int)
+        self.times = defaultdict(float)
+        self.lines = 0
+
+    def run(self, joiner):
+        rules = [
+            (
+                rule,
+                getattr(joiner, rule),
+                self.prefilters[rule],
+                range(RULES[rule]["window"][0], RULES[rule]["window"][1] + 1),
+            )
+            for rule in self.rules
+        ]
+        lines = joiner.lines
+        end = len(lines)
+        for index in joiner.indexes:
+            for name, rule, prefilter, window in rules:
+                for offset, search in prefilter:
+                    # lines past the end are left to the rule itself
+                    if index + offset < end and not search(lines[index + offset]):
+                        break
+                else:
+                    if not self.stats:
+                        rule(index)
+                        continue
+                    positions = [
+                        index + offset for offset in window if index + offset < end
+                    ]
+                    before = [lines[position] for position in positions]
+                    start = perf_counter()
+                    rule(index)
+                    self.times[name] += perf_counter() - start
+                    self.calls[name] += 1
+                    if before != [lines[position] for position in positions]:
+                        self.hits[name] += 1
+        self.lines += end
+        return joiner
+
+    def report(self):
+        """
+        Returns a table of the calls, hits and time of each rule, over all
+        NodeJoiners run so far
+        """
+        rows = [f"{'rule':<30}{'calls':>8}{'hits':>8}{'time (s)':>10}"]
+        for rule in self.rules:
+            rows.append(
+                f"{rule:<30}{self.calls[rule]:>8}{self.hits[rule]:>8}"
+                f"{self.times[rule]:>10.4f}"
+            )
+        rows.append(f"{self.lines} lines")
+        return "\n".join(rows)
+
 
 class NodeJoiner:
     
@@ -55,6 +293,13 @@ class NodeJoiner:
         # self.name = os.path.basename(file.name)
         # self.file_type = os.path.splitext(file.name)[1]
         
+    def scan(self, rules):
+        """
+        Runs the given rules (names of NodeJoiner methods) over all lines in a
+        single pass, see RulePipeline
+        """
+        return RulePipeline(rules).run(self)
+
     def _join_tag(self, tag):
         new_tag = ""
         for c in tag:
@@ -69,37 +314,33 @@ class NodeJoiner:
     # TODO: make it work
     def remove_punctuation(self, index):
 
-        COMMA_NODE = r"\(PUNC ,\)(?!\))"
-
-        if re.search(COMMA_NODE, self.lines[index]):
+        if COMMA_NODE.search(self.lines[index]):
 
-            self.lines[index] = re.sub(COMMA_NODE, "", self.lines[index])
+            self.lines[index] = COMMA_NODE.sub("", self.lines[index])
             print(self.lines[index])
 
 
     def join_verbs_same_line(self, index):
 
-        if re.search(PARTICLE_NODE, self.lines[index]) and re.search(
-                VERB_NODE, self.lines[index]):
+        if PARTICLE_NODE.search(self.lines[index]) and VERB_NODE.search(
+                self.lines[index]):
 
 
-            self.lines[index] = re.sub(
-                VERB_START,
-                re.findall(PARTICLE_TOKEN, self.lines[index])[0],
+            self.lines[index] = VERB_START.sub(
+                PARTICLE_TOKEN.findall(self.lines[index])[0],
                 self.lines[index],
             )
 
-            verb_tag = re.findall(VERB_TAG, self.lines[index])[0]
+            verb_tag = VERB_TAG.findall(self.lines[index])[0]
             verb_tag = self._join_tag(verb_tag)
 
-            self.lines[index] = re.sub(
-                VERB_TAG,
+            self.lines[index] = VERB_TAG.sub(
                 re.findall(verb_tag, self.lines[index])[0] +
                 '-PART',
                 self.lines[index],
             )
 
-            self.lines[index] = re.sub(PARTICLE_NODE, "", self.lines[index])
+            self.lines[index] = PARTICLE_NODE.sub("", self.lines[index])
 
     
     def join_verbs_two_lines(self, index):
@@ -117,8 +358,8 @@ class NodeJoiner:
 
         prev = index - 1
         next = index + 1
-        if re.search(PARTICLE_NODE, self.lines[prev]) and re.search(
-                VERB_NODE, self.lines[index]
+        if PARTICLE_NODE.search(self.lines[prev]) and VERB_NODE.search(
+                self.lines[index]
         ):
             # print('\t', prev, self.lines[prev].strip())
             # print('\t', index, self.lines[index].strip())
@@ -126,19 +367,17 @@ class NodeJoiner:
             # print()
 
             # updated verb token
-            self.lines[index] = re.sub(
-                VERB_START,
-                re.findall(PARTICLE_TOKEN, self.lines[prev])[0],
+            self.lines[index] = VERB_START.sub(
+                PARTICLE_TOKEN.findall(self.lines[prev])[0],
                 self.lines[index],
             )
 
             # update verb lemma:
             # verb tag found
-            verb_tag = re.findall(VERB_TAG, self.lines[index])[0]
+            verb_tag = VERB_TAG.findall(self.lines[index])[0]
             verb_tag = self._join_tag(verb_tag)
 
-            self.lines[index] = re.sub(
-                VERB_TAG,
+            self.lines[index] = VERB_TAG.sub(
                 re.findall(verb_tag, self.lines[index])[0] +
                 '-PART',
                 self.lines[index],
@@ -164,12 +403,12 @@ class NodeJoiner:
             #    "-" + lemma_token, new_lemma.lower(), self.lines[index], 1
             # )
             # particle node deleted
-            self.lines[prev] = re.sub(PARTICLE_NODE, "", self.lines[prev])
+            self.lines[prev] = PARTICLE_NODE.sub("", self.lines[prev])
 
             # removes the phrase-level of directional particles
             # possibly not needed
-            if re.search(r"\(ADVP-DIR \)", self.lines[prev]):
-               re.sub(r"\(ADVP-DIR \)", "", self.lines[prev])
+            if ADVPDIR_NODE.search(self.lines[prev]):
+               ADVPDIR_NODE.sub("", self.lines[prev])
                 
             # print('\t\t', prev, self.lines[prev].strip())
             # print('\t\t', index, self.lines[index].strip())
@@ -184,8 +423,8 @@ class NodeJoiner:
         prev = index - 1
         # next = index + 1
         
-        if re.search(PARTICLE_MIDDLE_NODE, self.lines[prev]) and re.search(
-            VERB_NODE, self.lines[index]):
+        if PARTICLE_MIDDLE_NODE.search(self.lines[prev]) and VERB_NODE.search(
+            self.lines[index]):
             # print('\t', prev, self.lines[prevprev].strip())
             # print('\t', index, self.lines[prev].strip())
             # print('\t', next, self.lines[index].strip())
@@ -193,24 +432,21 @@ class NodeJoiner:
 
             # particles joined
             try:
-                self.lines[prev] = re.sub(
-                    PARTICLE_START,
-                    re.findall(PARTICLE_TOKEN, self.lines[prevprev])[0],
+                self.lines[prev] = PARTICLE_START.sub(
+                    PARTICLE_TOKEN.findall(self.lines[prevprev])[0],
                     self.lines[prev],
                 )
             # updated verb token
-                self.lines[index] = re.sub(
-                    VERB_START,
-                    re.findall(PARTICLE_TOKEN, self.lines[prev])[0],
+                self.lines[index] = VERB_START.sub(
+                    PARTICLE_TOKEN.findall(self.lines[prev])[0],
                     self.lines[index],
                 )
             # update verb lemma:
             # verb tag found
-                verb_tag = re.findall(VERB_TAG, self.lines[index])[0]
+                verb_tag = VERB_TAG.findall(self.lines[index])[0]
                 verb_tag = self._join_tag(verb_tag)
 
-                self.lines[index] = re.sub(
-                    VERB_TAG,
+                self.lines[index] = VERB_TAG.sub(
                     re.findall(verb_tag, self.lines[index])[0] +
                     '-PART',
                     self.lines[index],
@@ -237,11 +473,11 @@ class NodeJoiner:
             #    "-" + lemma_token, new_lemma.lower(), self.lines[index], 1
             # )
             # particle node deleted
-                self.lines[prev] = re.sub(PARTICLE_NODE, "", self.lines[prev])
-                self.lines[prevprev] = re.sub(PARTICLE_NODE, "", self.lines[prevprev])
+                self.lines[prev] = PARTICLE_NODE.sub("", self.lines[prev])
+                self.lines[prevprev] = PARTICLE_NODE.sub("", self.lines[prevprev])
 
-                if re.search(r"\(ADVP-DIR \)", self.lines[prevprev]):
-                    re.sub(r"\(ADVP-DIR \)", "", self.lines[prevprev])
+                if ADVPDIR_NODE.search(self.lines[prevprev]):
+                    ADVPDIR_NODE.sub("", self.lines[prevprev])
 
             # print('\t\t', prev, self.lines[prevprev].strip())
             # print('\t\t', index, self.lines[prev].strip())
@@ -257,39 +493,20 @@ class NodeJoiner:
         Uses NPR tag and type of determiner
         """
 
-        propNOUN_NODE = r"\(NPR.*"
-        DN_NODE = r"\(NP.*\(D.*\(N"
-        D_NODE = r"\(D [a-z]*\)(?!\))"
-        N_NODE = r"(N[^P]{0,4})(?: )"
-        #NP-EXPL make this not work, hardcoded for the moment
-        NPEXPL_NODE = r"\(NP-EXPL"
-        Nnwl_TAG = r"(?<=\()N[^P]{0,4}(?= )"
-        D_TOKEN = r"(?:\bD.{0,4} )(\w+)+"
-        N_TAG = r"(?:\(NP.*\(D.*\()(N.{0,4})(?: )"
-
-        # TODO: look at the contracted forms with @
-        definites = ["der", "di", "dem", "dos", "den", "das", "dr",
-                     "ds", "eyner", "yener", "daz", "dz", "yenem",
-                     "yene", "di_dozike", "dus", "yens", "dizn", "des",
-                     "der_doziker", "die", "didozike", "dizr", "dis",
-                     "doz", "dizir", "dizh", "dizs"]
-
-        indefinites = ["a", "eyn", "an", "ayn", "eyne", "ayner", "in", "aynem"]
-
         next = index + 1
         nextnext = index + 2
 
-        if re.search(DN_NODE, self.lines[index]):
+        if DN_NODE.search(self.lines[index]):
 
             try:
-                d_token = re.findall(D_TOKEN, self.lines[index])[0]
-                n_tag = re.findall(N_TAG, self.lines[index])[0]
+                d_token = D_TOKEN.findall(self.lines[index])[0]
+                n_tag = N_TAG.findall(self.lines[index])[0]
 
-                if d_token in definites:
+                if d_token in DEFINITES:
                     self.lines[index] = re.sub(
                        rf"\b{n_tag}\b", n_tag + '-' + 'D', self.lines[index])
                     
-                elif d_token in indefinites:
+                elif d_token in INDEFINITES:
                     self.lines[index] = re.sub(
                         rf"\b{n_tag}\b", n_tag + '-' + 'I', self.lines[index])
 
@@ -300,22 +517,22 @@ class NodeJoiner:
                 pass
 
 
-        elif  re.search(D_NODE, self.lines[index]) and re.search(
-                N_NODE, self.lines[next]) and re.search(
-                    NPEXPL_NODE, self.lines[index]) == None and re.search(
-                        r"\(D.*\)\)\n", self.lines[index]) == None and re.search(
-                            r"\(ADJP \(PRO\$", self.lines[next]) == None:
+        elif  D_NODE.search(self.lines[index]) and N_NODE.search(
+                self.lines[next]) and NPEXPL_NODE.search(
+                    self.lines[index]) == None and Dend_NODE.search(
+                        self.lines[index]) == None and ADJPPRO_NODE.search(
+                            self.lines[next]) == None:
 
             try:
-                d_token = re.findall(D_TOKEN, self.lines[index])[0]
-                n_tag = re.findall(Nnwl_TAG, self.lines[next])[0]
+                d_token = D_TOKEN.findall(self.lines[index])[0]
+                n_tag = Nnwl_TAG.findall(self.lines[next])[0]
 
 
-                if d_token in definites:
+                if d_token in DEFINITES:
                     self.lines[next] = re.sub(
                        rf"\b{n_tag}\b", n_tag + '-' + 'D', self.lines[next])
 
-                elif d_token in indefinites:
+                elif d_token in INDEFINITES:
                     self.lines[next] = re.sub(
                         rf"\b{n_tag}\b", n_tag + '-' + 'I', self.lines[next])
 
@@ -327,36 +544,26 @@ class NodeJoiner:
 
     def assign_reflexive(self, index):
 
-        rflNP_NODE = r"\(NP-RFL \(PRO"
-        rflPRO_TAG = r"(?<=NP-RFL \()PRO"
+        if rflNP_NODE.search(self.lines[index]):
 
-        if re.search(rflNP_NODE, self.lines[index]):
-
-            self.lines[index] = re.sub(rflPRO_TAG, 'PRO-RFL', self.lines[index])
+            self.lines[index] = rflPRO_TAG.sub('PRO-RFL', self.lines[index])
 
         return self
     
 
     def join_adverbs(self, index):
 
-        negADV_NODE = r"\(ADV @o(?=\)\))"
-        negADV_TAG = r"(?=\()ADV(?= @o)"
-        NEG_NODE = r"\(NEG [a-z]+@\)"
-        NEG_TOKEN = r"(?<=\(NEG )[a-z]+(?=@)"
-        NEG_TAG = r"\(?<=\()NEG(?= )"
-
         next  = index + 1
         
-        if re.search(NEG_NODE, self.lines[index]) and re.search(
-                negADV_NODE, self.lines[next]):
+        if NEG_NODE.search(self.lines[index]) and negADV_NODE.search(
+                self.lines[next]):
 
-            self.lines[next] = re.sub(negADV_NODE,
-                                      '(ADV-NEG ' +
-                                      re.findall(NEG_TOKEN, self.lines[index])[0] +
-                                      'o',
-                                      self.lines[next])
+            self.lines[next] = negADV_NODE.sub('(ADV-NEG ' +
+                                               NEG_TOKEN.findall(self.lines[index])[0] +
+                                               'o',
+                                               self.lines[next])
 
-            self.lines[index] = re.sub(NEG_NODE, "", self.lines[index])
+            self.lines[index] = NEG_NODE.sub("", self.lines[index])
 
         
     def assign_case(self, index):
@@ -374,168 +581,140 @@ class NodeJoiner:
 	        (NP-OB1 (D-ACC an) (ADJ-ACC eygenem) (N-ACC ser-blat)))
               (ID 1927E-SHATZKY-TESHUAT,12.6))
         """
-        
-        NPcased_NODE = r"\(NP-.{3}(?!.*(\*))"# the star is preliminary
-        NPinNP_NODE = r"\(NP-.{3} \(NP.*"
-        embNP_NODE = r"(?<=\(NP-.{3} \()NPR?(?=\s)"
-        NPcaseless_TAG = r"(?<=\()NPR?"
-        NPcased_TAG = r"(?<=\()NP-.{3}"
-        RSPNPcased_TAG = "(?<=\()NP-.{3}-RSP"
-        CAT_TAG = r"(?<=\()NP(?=-.{3})"
-        CASE_INFO = r"(?<=\(NP-)(SBJ|ACC|DTV|GEN|LGS)"
-        complexNP_NODE = r"(?<=\(NP-.{3} \()(?<!\w)(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)(?=\s)"
-        
-        SMCSUBJ_NODE = r"\(IP-SMC \(NP-SBJ.*\)"
-        
-        CONJP_NODE = r"\(CONJP.*"
-        
-        RSPNP_NODE = r"NP-.{3}-RSP"
-        RSPCASE_INFO = r"(?<=\(NP-)(SBJ|ACC|DTV|GEN|LGS)(?=-RSP)"
-        complexRSPNP_NODE = r"(?<=\(NP-.{3}-RSP \()(?<!\w)(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)(?=\s)"
-        RSPNPCAT_TAG = r"(?<=\()NP(?=-.{3}-RSP)"
-
-        case_dict = {
-            "ACC": "OB1",
-            "DTV": "OB2",
-            "LGS": "SBJ", 
-            "GEN": "GEN",
-            }
 
         next = index + 1
         nextnext = index + 2
 
         # add SBJ to NPs that are contained in NPs, e.g. for conjunctions
-        if re.search(NPinNP_NODE, self.lines[index]) and re.search(CONJP_NODE, self.lines[next]):
+        if NPinNP_NODE.search(self.lines[index]) and CONJP_NODE.search(self.lines[next]):
 
             try:
-                case_info = re.findall(CASE_INFO, self.lines[index])[0]
-                embNP_node = re.findall(embNP_NODE, self.lines[index])[0]
+                case_info = CASE_INFO.findall(self.lines[index])[0]
+                embNP_node = embNP_NODE.findall(self.lines[index])[0]
                 
-                self.lines[index] = re.sub(
-                    embNP_NODE, embNP_node + '-' + case_info, self.lines[index])
-                self.lines[nextnext] = re.sub(
-                    NPcaseless_TAG, embNP_node + '-' + case_info, self.lines[nextnext])
+                self.lines[index] = embNP_NODE.sub(
+                    embNP_node + '-' + case_info, self.lines[index])
+                self.lines[nextnext] = NPcaseless_TAG.sub(
+                    embNP_node + '-' + case_info, self.lines[nextnext])
                 
             except IndexError:
                 pass
             
 
-        elif re.search(NPinNP_NODE, self.lines[index]):
+        elif NPinNP_NODE.search(self.lines[index]):
 
             try:
-                case_info = re.findall(CASE_INFO, self.lines[index])[0]
-                embNP_node = re.findall(embNP_NODE, self.lines[index])[0]
+                case_info = CASE_INFO.findall(self.lines[index])[0]
+                embNP_node = embNP_NODE.findall(self.lines[index])[0]
                 
-                self.lines[index] = re.sub(
-                    embNP_NODE, embNP_node + '-' + case_info, self.lines[index])
+                self.lines[index] = embNP_NODE.sub(
+                    embNP_node + '-' + case_info, self.lines[index])
                 
             except IndexError:
                 pass
 
         # Case for small clauses, where the subject bears accusative cae
-        if re.search(SMCSUBJ_NODE, self.lines[index]):
+        if SMCSUBJ_NODE.search(self.lines[index]):
             
             try:
-                case_info = re.findall(CASE_INFO, self.lines[index])[0]
-                pro_node = re.findall(complexNP_NODE, self.lines[index])[0]
+                case_info = CASE_INFO.findall(self.lines[index])[0]
+                pro_node = complexNP_NODE.findall(self.lines[index])[0]
 
-                self.lines[index] = re.sub(
-                    complexNP_NODE, pro_node + '-' + 'ACC', self.lines[index])
+                self.lines[index] = complexNP_NODE.sub(
+                    pro_node + '-' + 'ACC', self.lines[index])
 
             except IndexError:
                 pass            
 
         # Case assignment for resumptives
-        elif re.search(RSPNP_NODE, self.lines[index]):
+        elif RSPNP_NODE.search(self.lines[index]):
 
             try:
-                case_info = re.findall(RSPCASE_INFO, self.lines[index])[0]
-                pro_node = re.findall(complexRSPNP_NODE, self.lines[index])[0]
-                cat_tag = re.findall(CAT_TAG, self.lines[index])[0]
+                case_info = RSPCASE_INFO.findall(self.lines[index])[0]
+                pro_node = complexRSPNP_NODE.findall(self.lines[index])[0]
+                cat_tag = CAT_TAG.findall(self.lines[index])[0]
 
                 if case_info == 'SBJ':
-                    self.lines[index] = re.sub(
-                        complexRSPNP_NODE, pro_node + '-' + 'NOM', self.lines[index])
+                    self.lines[index] = complexRSPNP_NODE.sub(
+                        pro_node + '-' + 'NOM', self.lines[index])
 
                 elif case_info == 'ACC' or 'DTV':
-                    self.lines[index] = re.sub(
-                        complexRSPNP_NODE, pro_node + '-' + case_info, self.lines[index])
+                    self.lines[index] = complexRSPNP_NODE.sub(
+                        pro_node + '-' + case_info, self.lines[index])
 
-                    self.lines[index] = re.sub(
-                        RSPNPcased_TAG, cat_tag + '-' + case_dict[case_info] + '-RSP',
+                    self.lines[index] = RSPNPcased_TAG.sub(
+                        cat_tag + '-' + CASE_DICT[case_info] + '-RSP',
                         self.lines[index])
 
             except IndexError:
                 pass
             
         # All non small clause cases
-        elif re.search(NPcased_NODE, self.lines[index]) and re.search(CASE_INFO, self.lines[index]):
+        elif NPcased_NODE.search(self.lines[index]) and CASE_INFO.search(self.lines[index]):
             try: 
-                case_info = re.findall(CASE_INFO, self.lines[index])[0]
-                pro_node = re.findall(complexNP_NODE, self.lines[index])[0]
-                np_tag = re.findall(NPcased_TAG, self.lines[index])[0]
-                cat_tag = re.findall(CAT_TAG, self.lines[index])[0]
+                case_info = CASE_INFO.findall(self.lines[index])[0]
+                pro_node = complexNP_NODE.findall(self.lines[index])[0]
+                np_tag = NPcased_TAG.findall(self.lines[index])[0]
+                cat_tag = CAT_TAG.findall(self.lines[index])[0]
             
                 if case_info == 'SBJ':
-                    self.lines[index] = re.sub(
-                        complexNP_NODE, pro_node + '-' + 'NOM', self.lines[index])
+                    self.lines[index] = complexNP_NODE.sub(
+                        pro_node + '-' + 'NOM', self.lines[index])
 
                 elif case_info == 'LGS':
-                     self.lines[index] = re.sub(
-                        complexNP_NODE, pro_node + '-' + 'NOM', self.lines[index])
+                     self.lines[index] = complexNP_NODE.sub(
+                        pro_node + '-' + 'NOM', self.lines[index])
 
-                     self.lines[index] = re.sub(
-                        NPcased_TAG, cat_tag + '-' + case_dict[case_info], self.lines[index])
+                     self.lines[index] = NPcased_TAG.sub(
+                        cat_tag + '-' + CASE_DICT[case_info], self.lines[index])
                     
                 elif case_info == 'ACC' or 'DTV':
-                    self.lines[index] = re.sub(
-                        complexNP_NODE, pro_node + '-' + case_info, self.lines[index])
+                    self.lines[index] = complexNP_NODE.sub(
+                        pro_node + '-' + case_info, self.lines[index])
                     
-                    self.lines[index] = re.sub(
-                        NPcased_TAG, cat_tag + '-' + case_dict[case_info], self.lines[index])
+                    self.lines[index] = NPcased_TAG.sub(
+                        cat_tag + '-' + CASE_DICT[case_info], self.lines[index])
                     
             except IndexError:
                 pass
 
-        if re.search(r"\(NP-(SBJ|ACC|DTV|GEN) \(QP \(D", self.lines[index]):
+        if QPD_NODE.search(self.lines[index]):
             try:
-                case_info = re.findall(CASE_INFO, self.lines[index])[0]
-                cat_tag = re.findall(CAT_TAG, self.lines[index])[0]
+                case_info = CASE_INFO.findall(self.lines[index])[0]
+                cat_tag = CAT_TAG.findall(self.lines[index])[0]
 
                 if case_info == 'SBJ':
-                    self.lines[index] = re.sub(
-                        r"\(D", "(D" + '-' + 'NOM', self.lines[index])
+                    self.lines[index] = D_TAG.sub(
+                        "(D" + '-' + 'NOM', self.lines[index])
                     
                 elif case_info == 'ACC' or 'DTV':
-                    self.lines[index] = re.sub(
-                        r"\(D", "(D" + '-' + case_info, self.lines[index])
+                    self.lines[index] = D_TAG.sub(
+                        "(D" + '-' + case_info, self.lines[index])
                     
-                    self.lines[index] = re.sub(
-                        NPcased_TAG, cat_tag + '-' + case_dict[case_info], self.lines[index])
+                    self.lines[index] = NPcased_TAG.sub(
+                        cat_tag + '-' + CASE_DICT[case_info], self.lines[index])
 
             except IndexError:
                 pass
 
 
-        if re.search(r"\(NP-(SBJ|ACC|DTV|GEN) \(ADV [a-z]*\) \([A-Z]*", self.lines[index]):
+        if ADVNP_NODE.search(self.lines[index]):
 
             try:
-                case_info = re.findall(CASE_INFO, self.lines[index])[0]
-                cat_tag = re.findall(CAT_TAG, self.lines[index])[0]
-                goal_tag = re.findall(
-                    r"(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)(?=\s)",
-                    self.lines[index])[0]
+                case_info = CASE_INFO.findall(self.lines[index])[0]
+                cat_tag = CAT_TAG.findall(self.lines[index])[0]
+                goal_tag = GOAL_TAG.findall(self.lines[index])[0]
 
                 if case_info == 'SBJ':
                     self.lines[index] = re.sub(
                         goal_tag, goal_tag + '-' + 'NOM', self.lines[index])
                     
                 elif case_info == 'ACC' or 'DTV':
-                    self.lines[index] = re.sub(
-                        r"(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)(?=\s)", goal_tag + '-' + case_info, self.lines[index],1)
+                    self.lines[index] = GOAL_TAG.sub(
+                        goal_tag + '-' + case_info, self.lines[index],1)
                     
-                    self.lines[index] = re.sub(
-                        NPcased_TAG, cat_tag + '-' + case_dict[case_info], self.lines[index])
+                    self.lines[index] = NPcased_TAG.sub(
+                        cat_tag + '-' + CASE_DICT[case_info], self.lines[index])
                 
             except IndexError:
                 pass
@@ -556,30 +735,21 @@ class NodeJoiner:
         """ 
 
         # TOOD: QP, QR, CP boundaries, cases where (NP (N schewrt) (CONJ un) (N spies))
-        PROBE_NODE = r"\(\b(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)\b-.{3}(?!.*(\*))"
-        PROBE_CASE = r"\(\b(?:PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D)\b-(NOM|ACC|DTV)"
-        GOAL_NODE = r"(?<!\w)(PRO\$|PRO|Q(?!\spor)|NUM|N|ADJ|ADJR|ADJS|D)(?=\s)"
-        DconjD_NODE = r"\(D \(D"
-
-        case_dict = {
-            "ACC": "OB1",
-            "DTV": "OB2"
-            }
 
         # do we need a try/except block here to handle errors? 
-        if re.search(PROBE_NODE, self.lines[index]):
+        if PROBE_NODE.search(self.lines[index]):
 
             try:
-                case_info = re.findall(PROBE_CASE, self.lines[index])[0]
+                case_info = PROBE_CASE.findall(self.lines[index])[0]
 
-                for nodes in re.findall(GOAL_NODE, self.lines[index]):
+                for nodes in GOAL_NODE.findall(self.lines[index]):
 
                     # weird behaviour of $ in PRO$
                     # this is a hardcoded solution, its because of the rf-string
 
                     if nodes == "PRO$":
-                        self.lines[index] = re.sub(
-                            r"PRO\$", nodes + '-' + case_info, self.lines[index])
+                        self.lines[index] = PROd_TAG.sub(
+                            nodes + '-' + case_info, self.lines[index])
 
                     else:
                         self.lines[index] = re.sub(
@@ -604,38 +774,35 @@ class NodeJoiner:
         (ID 1927E-SHATZKY-TESHUAT,12.10))
         """
         
-        PROBE_NODE = r"\(\b(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D|QP)\b-.{3}(?!.*(\*))"
-        PROBE_CASE = r"\(\b(?:PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D|QP)\b-(NOM|ACC|DTV)"
-        GOAL_NODE = r"(?<!\w)(PRO\$|PRO|Q|NUM|N|ADJ|ADJR|ADJS|D|QP)(?=\s)"
 
         next = index + 1
         
         # TODO: Does not work with IP-ABS(?)
-        if re.search(PROBE_NODE, self.lines[index]) and re.search(
-                r"\(Q\s", self.lines[index]):
+        if PROBEconj_NODE.search(self.lines[index]) and Q_NODE.search(
+                self.lines[index]):
 
             try:
-                case_info = re.findall(PROBE_CASE, self.lines[index])[0]
+                case_info = PROBEconj_CASE.findall(self.lines[index])[0]
 
-                for nodes in re.findall(GOAL_NODE, self.lines[next]):
+                for nodes in GOALconj_NODE.findall(self.lines[next]):
                     self.lines[next] = re.sub(
                         rf"\b{nodes}\b", nodes + '-' + case_info, self.lines[next])
 
             except IndexError:
                 pass
                 
-        elif re.search(PROBE_NODE, self.lines[index]) and re.search(
-                GOAL_NODE, self.lines[next]) and re.search(
-                    r"\(NP.*\)\)", self.lines[index]) == None and re.search(
-                        r"\(ADJP \(PRO\$", self.lines[next]) == None: 
+        elif PROBEconj_NODE.search(self.lines[index]) and GOALconj_NODE.search(
+                self.lines[next]) and NPclosed_NODE.search(
+                    self.lines[index]) == None and ADJPPRO_NODE.search(
+                        self.lines[next]) == None: 
 
             try:
-                case_info = re.findall(PROBE_CASE, self.lines[index])[0]
+                case_info = PROBEconj_CASE.findall(self.lines[index])[0]
 
-                for nodes in re.findall(GOAL_NODE, self.lines[next]):
+                for nodes in GOALconj_NODE.findall(self.lines[next]):
                     if nodes == "PRO$":
-                        self.lines[next] =  re.sub(
-                            rf"PRO\$", nodes + '-' + case_info, self.lines[next])
+                        self.lines[next] =  PROd_TAG.sub(
+                            nodes + '-' + case_info, self.lines[next])
                     else:
                         self.lines[next] =  re.sub(
                             rf"\b{nodes}\b", nodes + '-' + case_info, self.lines[next])
@@ -647,34 +814,21 @@ class NodeJoiner:
 
     def join_preposition_determiner(self, index):
 
-        Psep_NODE = r"\(PP \(P .*\@\)"
-        P_TAG = r"(?<=\(PP \()P(?= )"
-        P_TOKEN_at = r"(?<=\(P-CL )[a-z]+\@(?=\))"
-        P_TOKEN = r"(?<=\(P-CL )[a-z]+(?=\@\))"
-        Dsep_NODE = r"\(NP \(D @.*\)"
-        D_NODE = r"(?<=\(NP )\(D @[a-z]+\)"
-        D_TAG = r"(?<=\()D(?= @)"
-        D_TOKEN = r"(?<=\(NP \(D @)[a-z]+(?=\))"
-
         next = index + 1
 
-        if re.search(Psep_NODE, self.lines[index]) and re.search(D_NODE, self.lines[next]):
+        if Psep_NODE.search(self.lines[index]) and Dcl_NODE.search(self.lines[next]):
 
 
-            self.lines[index] = re.sub(P_TAG,
-                                       re.findall(P_TAG, self.lines[index])[0] +
-                                       '-CL',
-                                       self.lines[index])
+            self.lines[index] = P_TAG.sub(
+                P_TAG.findall(self.lines[index])[0] + '-CL',
+                self.lines[index])
 
-            
-            self.lines[index] = re.sub(P_TOKEN_at,
-                                       re.findall(P_TOKEN, self.lines[index])[0] +
-                                       re.findall(D_TOKEN, self.lines[next])[0],
-                                       self.lines[index])
-
-            self.lines[next] = re.sub(D_NODE,
-                                      "(D 0)",
-                                      self.lines[next])
+            self.lines[index] = P_TOKEN_at.sub(
+                P_TOKEN.findall(self.lines[index])[0] +
+                Dcl_TOKEN.findall(self.lines[next])[0],
+                self.lines[index])
+
+            self.lines[next] = Dcl_NODE.sub("(D 0)", self.lines[next])
         
     def debug_lines(self, index):
         curr_line, prev_line = self.lines[index].split("\t"), self.lines[
@@ -690,13 +844,12 @@ class NodeJoiner:
         A bit of an ugly workaround, maybe do better with case assignment
         """
 
-        CASEstack_NODE = r"(?:-NOM){2,}|(?:-ACC){2,}|(?:-DTV){2}"
 
-        if re.search(CASEstack_NODE, self.lines[index]):
+        if CASEstack_NODE.search(self.lines[index]):
 
-            casestack = re.findall(CASEstack_NODE, self.lines[index])[0]
+            casestack = CASEstack_NODE.findall(self.lines[index])[0]
             
-            for nodes in re.findall(CASEstack_NODE, self.lines[index]):
+            for nodes in CASEstack_NODE.findall(self.lines[index]):
 
                 case = nodes.split("-")[1]
 
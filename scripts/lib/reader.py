@@ -1,10 +1,57 @@
+import os
 import re
 import sys
+import json
+import mmap
+from collections import namedtuple, Counter
 
 from nltk.corpus.reader import CategorizedBracketParseCorpusReader
+from nltk.corpus.reader.util import StreamBackedCorpusView, concat
 from nltk.tree import Tree
 
-from lib.joiners import NodeJoiner
+from lib.joiners import NodeJoiner, RulePipeline, RULES
+
+# node of a tree in the table returned by IndexedCorpusTree.node_table(),
+# tree is the subtree at position, or the leaf string if is_leaf
+TreeNode = namedtuple("TreeNode", "position tree parent depth label is_leaf")
+
+# shared symbol table of the labels of the trees and the tags and relations
+# of the dependency graphs, a few hundred distinct strings which are stored
+# once and compared by identity before their contents
+symbol = sys.intern
+
+# first two letters of the PoS tags of verbs
+VERB_PREFIXES = {"VB", "BE", "DO", "HV", "MD", "RD"}
+
+# rules for joining seperated nodes in the IcePaHC tree structure, run on
+# the lines of a tree by IndexedCorpusTree.fromstring(preprocess=True)
+PREPROCESS = RulePipeline(
+    [
+        # Adverbs and various small nodes processed
+        # "join_adverbs",
+        # ADD METHOD HERE for fixing various nodes
+        # NPs processed
+        # "join_NPs",
+        # "join_split_nodes", # NOTE: tentatively removed because error
+
+        # verbs processed
+        # "join_verbs_same_line",
+        "join_verbs_two_lines",
+        "join_verbs_three_lines",
+        # adjectives processed
+        # "join_adjectives",
+    ]
+)
+
+# a rule only runs on a line matching its prefilter (see RULES), so a tree
+# without any of these is not changed by the preprocessing
+if all(0 in RULES[rule]["prefilter"] for rule in PREPROCESS.rules):
+    PREPROCESS_LITERALS = {
+        literal for rule in PREPROCESS.rules for literal in RULES[rule]["prefilter"][0]
+    }
+else:
+    PREPROCESS_LITERALS = None
+
 
 class IndexedCorpusTree(Tree):
     """
@@ -20,13 +67,20 @@ class IndexedCorpusTree(Tree):
     Attributes:
         _id (int): Counter for index.
         corpus_id (string): Sentence ID from original treebank, if applicable
+        pruned (Counter): nodes removed by remove_nodes(), None before
     """
 
+    # defaults of the attributes, set on the class as most nodes keep them
+    # and fromstring() creates nodes without calling __init__
+    _id = 0
+    corpus_id = None
+    corpus_id_num = None
+    pruned = None
+    _pruned_by = None  # (tags, trace) of remove_nodes()
+    _aggregates = None  # (height, leaves, verbs)
+
     def __init__(self, node, children=None):
         Tree.__init__(self, node, children)
-        self._id = 0
-        self.corpus_id = None
-        self.corpus_id_num = None
         # self._trim_ID(self)
 
         # if self.height() == 2:
@@ -34,46 +88,115 @@ class IndexedCorpusTree(Tree):
         #     or self.label() != 'ID' and re.match(r'\d+\.?', self[0]):
         #         self[0] = str(self[0])+'-'+(self[0])
 
+    def invalidate(self):
+        """
+        Drops the values cached on the tree and all its subtrees (see
+        aggregates() and remove_nodes()). Called on the top node of a tree
+        after changing it in place, as a subtree does not know its parents.
+        """
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            tree._aggregates = None
+            tree._pruned_by = None
+            stack.extend(
+                child for child in tree if isinstance(child, IndexedCorpusTree)
+            )
+
     @classmethod
     def fromstring(
         cls, s, trim_id_tag=False, preprocess=False, remove_empty_top_bracketing=False
     ):
         """
         Extension of parent class method to check for ID tag and
+
+        The text is read in a single scan by parse_brackets(), which builds
+        the nodes directly and reads the ID of the tree from its (ID ...)
+        node on the way.
         """
         # block for joining seperated nodes in the IcePaHC tree structure
-        if preprocess == True:
+        if preprocess == True and (
+            PREPROCESS_LITERALS is None
+            or any(literal in s for literal in PREPROCESS_LITERALS)
+        ):
             # print('\n'.join(s.split('\n')))
-            j = NodeJoiner(s.split("\n"))
+            j = PREPROCESS.run(NodeJoiner(s.split("\n")))
             # print('\n'.join(j.lines))
-            for n in j.indexes:
-                # Adverbs and various small nodes processed
-                # j.join_adverbs(n)
-                # ADD METHOD HERE for fixing various nodes
-                # NPs processed
-                # j.join_NPs(n)
-                # j.join_split_nodes(n) # NOTE: tentatively removed because error
-
-                # verbs processed
-                # j.join_verbs_same_line(n)
-                j.join_verbs_two_lines(n)
-                j.join_verbs_three_lines(n)
-                # adjectives processed
-                # j.join_adjectives(n)
-            # print('\n'.join(j.lines))
-        else:
-            j = NodeJoiner(s.split("\n"))
-        s = "\n".join(j.lines)
-        tree = super().fromstring(s)
+            s = "\n".join(j.lines)
+        tree = cls.parse_brackets(s)
+        if remove_empty_top_bracketing and tree._label == "" and len(tree) == 1:
+            tree = tree[0]
         if trim_id_tag and tree._label == "" and len(tree) == 2:
-            tree[0].corpus_id = str(tree[1]).strip("()ID ")
+            id_node = tree[1]
+            if (
+                isinstance(id_node, Tree)
+                and id_node._label == "ID"
+                and len(id_node) == 1
+                and isinstance(id_node[0], str)
+                and len(id_node[0]) < 60
+            ):
+                # str() of a short (ID ...) node, without formatting it
+                corpus_id = f"(ID {id_node[0]})".strip("()ID ")
+            else:
+                corpus_id = str(id_node).strip("()ID ")
+            tree[0].corpus_id = corpus_id
             try:
-                tree[0].corpus_id_num = str(tree[1]).strip("()ID ").split(",")[1]
+                tree[0].corpus_id_num = corpus_id.split(",")[1]
             except IndexError:
                 tree[0].corpus_id_num = None
             tree = tree[0]
         return tree
 
+    @classmethod
+    def parse_brackets(cls, s):
+        """
+        Reads a tree from its bracketed text, like nltk.Tree.fromstring()
+        with the default brackets and patterns, in a single scan over the
+        whitespace separated tokens of the text. Text with escaped brackets
+        is read by nltk.
+
+        Raises:
+            ValueError: if the brackets of the text are not balanced or the
+                text is not a single tree
+        """
+        if "\\" in s:
+            # escaped brackets in labels or leaves, leave these to nltk
+            return Tree.fromstring.__func__(cls, s)
+        new = cls.__new__
+        top = children = []  # children of the node being read
+        label = None
+        stack = []  # (label, children) of the nodes above it
+        expect_label = False  # an opening bracket was just read
+        for token in s.replace("(", " ( ").replace(")", " ) ").split():
+            if token == "(":
+                if not stack and top:
+                    raise ValueError(f"Expected end-of-string in tree: {s[:100]!r}")
+                stack.append((label, children))
+                label = ""
+                children = []
+                expect_label = True
+            elif token == ")":
+                if not stack:
+                    raise ValueError(f"Unexpected ')' in tree: {s[:100]!r}")
+                tree = new(cls)
+                list.__init__(tree, children)
+                tree._label = label
+                label, children = stack.pop()
+                children.append(tree)
+                expect_label = False
+            elif expect_label:
+                label = symbol(token)
+                expect_label = False
+            else:
+                if not stack:
+                    raise ValueError(f"Expected '(' in tree: {s[:100]!r}")
+                children.append(token)
+        if stack:
+            raise ValueError(f"Expected ')' in tree: {s[:100]!r}")
+        if not top:
+            raise ValueError(f"Expected '(' in tree: {s[:100]!r}")
+        return top[0]
+
     def id(self):
         """
         Returns the (leaf) index of the tree or leaf
@@ -87,6 +210,74 @@ class IndexedCorpusTree(Tree):
         """
         self._id = int(id)
 
+    def aggregates(self):
+        """
+        Returns the height, number of leaves and number of verbs (preterminals
+        with a verb tag) of the tree. Computed bottom-up in one pass and
+        cached on the tree and all its subtrees until invalidate() is called.
+
+        Returns:
+            tuple: (height, leaves, verbs)
+        """
+        if self._aggregates is not None:
+            return self._aggregates
+        height = leaves = verbs = 0
+        for child in self:
+            if isinstance(child, IndexedCorpusTree):
+                child_height, child_leaves, child_verbs = child.aggregates()
+            elif isinstance(child, Tree):
+                child_height, child_leaves, child_verbs = (
+                    child.height(),
+                    len(child.leaves()),
+                    0,
+                )
+            else:
+                child_height, child_leaves, child_verbs = 1, 1, 0
+            height = max(height, child_height)
+            leaves += child_leaves
+            verbs += child_verbs
+        height += 1
+        if height == 2 and str(self._label)[0:2] in VERB_PREFIXES:
+            verbs += 1
+        self._aggregates = (height, leaves, verbs)
+        return self._aggregates
+
+    def height(self):
+        """
+        Returns the height of the tree, see aggregates()
+        """
+        return self.aggregates()[0]
+
+    def num_leaves(self):
+        """
+        Returns the number of leaves of the tree, see aggregates()
+        """
+        return self.aggregates()[1]
+
+    def node_table(self):
+        """
+        Returns all nodes of the tree, subtrees and leaves, in the order of
+        treepositions(), found in a single traversal. Subtrees are referenced
+        directly, so they do not need to be looked up by position.
+
+        Returns:
+            list: TreeNode tuples (position, tree, parent, depth, label,
+                is_leaf), label is None for leaves
+        """
+        table = []
+        stack = [((), self, None)]
+        while stack:
+            position, tree, parent = stack.pop()
+            if isinstance(tree, Tree):
+                table.append(
+                    TreeNode(position, tree, parent, len(position), tree.label(), False)
+                )
+                for index in range(len(tree) - 1, -1, -1):
+                    stack.append((position + (index,), tree[index], tree))
+            else:
+                table.append(TreeNode(position, tree, parent, len(position), None, True))
+        return table
+
     def phrases(self):
         """
         Return the "constituencies" of the tree.
@@ -139,38 +330,36 @@ class IndexedCorpusTree(Tree):
         Used to estimate whether verb 'aux' UPOS is correct or wrong.
         Converter generalizes 'aux' UPOS for 'hafa' and 'vera'.
 
-        lambda function to only check two levels of tree, not further
+        lambda function to only check two levels of tree, not further, i.e.
+        only a preterminal is checked and phrases have no verbs. Read from
+        the cached aggregates(), which also count the verbs of phrases.
 
         Returns:
             int: Number of verb tags found in sentence.
 
         """
 
-        verb_count = 0
-        for tag in self.tags(lambda t: t.height() == 2):
-            # for tag in self.immmediate_tags():
-            # print(tag)
-            if tag[0:2] in {
-                "VB",
-                "BE",
-                "DO",
-                "HV",
-                "MD",
-                "RD",
-            }:
-                verb_count += 1
-
-        return verb_count
-
-    # def_remove_nodes() not yet added
-    # no idea what this does
+        if self.height() != 2:
+            return 0
+        return self.aggregates()[2]
 
     def remove_nodes(self, tags=None, trace=False):
         """
-        Removes all nodes from tree by specification
+        Removes all nodes from tree by specification, in a single bottom-up
+        pass over the tree:
+            - nodes with a label in tags, if they are children of the top
+              node or have a single leaf
+            - if trace, the trace of some PPs, e.g. (PP (P ...) (NP *T*-1)),
+              and empty verbs, (VB *)
+            - nodes left without children
 
         # TRACE NODE REMOVAL only tested for some PP nodes
 
+        A tree is only cleaned once by the same specification, calling this
+        again on it does nothing unless it was changed and invalidated in
+        between. The number of nodes removed by each rule ('tags', 'trace'
+        and 'empty') is kept in the attribute pruned.
+
         Arguments:
             tags (list): list of node labels to remove by
             trace (boolean): true if trace nodes should be removed
@@ -179,120 +368,56 @@ class IndexedCorpusTree(Tree):
             type: IndexedCorpusTree
 
         """
-        # for i in self.subtrees(filter=lambda t: t.height() == 2):
-        #     if trace == True:
-        #         if self[i][0][0] in {'0', '*'}:
-        #             print(subtree)
-        #             try:
-        #                 del self[i]
-        #                 # pass
-        #                 # print(subtree)
-        #                 # continue
-        #             except ValueError:
-        #                 # raise
-        #                 continue
-        #     if tags:
-        #         for tag in tags:
-        #             if subtree.label() == tag:
-        #                 try:
-        #                     self.remove(self[i])
-        #                     # continue
-        #                 except ValueError:
-        #                     continue
-        pairs_to_delete = []
-
-        if tags:
-            for child in self:
-                if type(child) != str:
-                    if child.label() in tags:
-                        self.remove(child)
-            for i in reversed(self.treepositions()):
-                # print(i)
-                if (
-                    isinstance(self[i], Tree)
-                    and self[i].height() == 2
-                    and len(self[i]) == 1
-                ):
-                    if self[i].label() in tags:
-                        parent_index = i[:-1]
-                        # print(self[i])
-                        # print(self[parent_index])
-                        pairs_to_delete.append((parent_index, i))
-            for parent, child in pairs_to_delete:
-                try:
-                    self[parent].remove(self[child])
-                except:
+        tags = frozenset(tags or ())
+        if self._pruned_by is not None:
+            pruned_tags, pruned_trace = self._pruned_by
+            if tags <= pruned_tags and pruned_trace >= trace:
+                return self
+            tags |= pruned_tags
+            trace |= pruned_trace
+        pruned = Counter()
+
+        def prune(tree, top=False):
+            kept = []
+            for child in tree:
+                if not isinstance(child, Tree):
+                    kept.append(child)
                     continue
-            pairs_to_delete = []
-
-        # Only set for a certain kind of PP Tree
-        if trace == True:
-            for i in reversed(self.treepositions()):
-                if isinstance(self[i], Tree):
-                    try:
-                        if (
-                            self[i].label() == "PP"
-                            and len(self[i]) == 2
-                            and self[i][1][0][0] == "*"
-                        ):
-                            child_index = i + (1,)
-                            pairs_to_delete.append((i, child_index))
-                            # if len(self[i][0]) == 0:
-                            #     parent_index = i[:-1]
-                            #     # self[parent_index].remove(self[i])
-                            #     pairs_to_delete.append((parent_index, i))
-                            # elif self[i][0][0] in {'0', '*'}:
-                            #     parent_index = i[:-1]
-                            #     pairs_to_delete.append((parent_index, i))
-                        elif (
-                            self[i].label() == "VB"
-                            and self[i].height() == 2
-                            and self[i][0] == "*"
-                        ):
-                            parent_index = i[:-1]
-                            pairs_to_delete.append((parent_index, i))
-                        # elif self[i].label() == 'CODE' \
-                        # and len(self[i]) == 2 \
-                        # and self[i][1][0][0] == '{':
-                        #    child_index = i + (1,)
-                        #    pairs_to_delete.append((i, child_index))
-                    except IndexError:
-                        continue
-            for parent, child in pairs_to_delete:
-
-                try:
-                    self[parent].remove(self[child])
-                except:
+                if top and child.label() in tags:
+                    pruned["tags"] += 1
                     continue
-            pairs_to_delete = []
-
-        # empty nodes removed (no args)
-        for i in reversed(self.treepositions()):
-            if isinstance(self[i], Tree) and len(self[i]) == 0:
-                # print(self[i], len(self[i]))
-                parent_index = i[:-1]
-                # self[parent_index].remove(self[i])
-                pairs_to_delete.append((parent_index, i))
-
-        for parent, child in pairs_to_delete:
-            try:
-                # print('parent:', self[parent], len(parent))
-                # print('child:',self[child], len(child))
-                # child length checked, should only be 0
-                if len(self[i]) == 0:
-                    self[parent].remove(self[child])
-                    self.remove_nodes()
+                prune(child)
+                leaves_only = len(child) > 0 and not any(
+                    isinstance(grandchild, Tree) for grandchild in child
+                )
+                if leaves_only and len(child) == 1 and child.label() in tags:
+                    pruned["tags"] += 1
+                elif (
+                    trace
+                    and leaves_only
+                    and child.label() == "VB"
+                    and child[0] == "*"
+                ):
+                    pruned["trace"] += 1
+                elif len(child) == 0:
+                    pruned["empty"] += 1
                 else:
-                    # if designated child not empty, correct child found
-                    for subtree in self[parent]:
-                        if len(subtree) == 0:
-                            self[parent].remove(self[child])
-                            self.remove_nodes()
-                    # raise(IndexedCorpusTreeError('tried to delete non-empty node'))
-            except:
-                continue
-
-        # print('clean out:\n',self)
+                    kept.append(child)
+            if trace and tree.label() == "PP" and len(kept) == 2:
+                try:
+                    if kept[1][0][0] == "*":
+                        pruned["trace"] += 1
+                        del kept[1]
+                except IndexError:
+                    pass
+            if len(kept) != len(tree):
+                tree[:] = kept
+
+        prune(self, top=True)
+        if pruned:
+            self.invalidate()
+        self._pruned_by = (tags, trace)
+        self.pruned = pruned
         return self
 
     def remove_trace_nodes(self):
@@ -326,6 +451,371 @@ class IndexedCorpusTreeError(Exception):
             return "IndexedCorpusTreeError has been raised"
 
 
+def read_trees(stream):
+    """
+    Reads the trees of a .psd file one at a time, without reading the whole
+    file into memory. Yields the text of each tree from the line of its
+    opening bracket to the line where its brackets are balanced again. Text
+    between trees (e.g. blank lines) is skipped.
+
+    A tree whose brackets are never balanced ends where the next tree begins,
+    i.e. at the next line starting with an unindented bracket, so that the
+    tree can still be recovered when parsed.
+
+    Args:
+        stream: file object or other stream with a readline() method
+
+    Yields:
+        str: text of a single tree
+    """
+    lines = []  # lines of the current tree only
+    depth = 0
+    for line in iter(stream.readline, ""):
+        if not lines:
+            if "(" not in line:
+                continue
+        elif depth > 0 and line.startswith("("):
+            yield "".join(lines)
+            lines = []
+            depth = 0
+        lines.append(line)
+        depth += line.count("(") - line.count(")")
+        if depth <= 0:
+            yield "".join(lines)
+            lines = []
+            depth = 0
+    if lines:
+        yield "".join(lines)
+
+
+def read_tree(stream):
+    """
+    Reads the next tree of a seekable stream, like read_trees() but a single
+    tree per call, e.g. for the blocks of a corpus view. The line that ends
+    a tree whose brackets are never balanced, i.e. the first line of the
+    next tree, is left for the next call by seeking back to its start.
+
+    Args:
+        stream: stream with readline(), tell() and seek() methods, in bytes
+            positions (e.g. nltk's SeekableUnicodeStreamReader)
+
+    Returns:
+        str: text of a single tree, an empty string at the end of the stream
+    """
+    lines = []
+    depth = 0
+    for line in iter(stream.readline, ""):
+        if not lines:
+            if "(" not in line:
+                continue
+        elif depth > 0 and line.startswith("("):
+            stream.seek(stream.tell() - len(line.encode(stream.encoding)))
+            break
+        lines.append(line)
+        depth += line.count("(") - line.count(")")
+        if depth <= 0:
+            break
+    return "".join(lines)
+
+
+class TreeHandle:
+    """
+    Unparsed tree of a .psd file, as returned by TreeIndex.handles(). Holds
+    the raw text of the tree with its position and byte span in the file,
+    and reads the corpus ID and the leaves from the text. The tree is only
+    parsed when its structure is accessed, through the tree attribute or
+    any attribute, index or method of IndexedCorpusTree on the handle.
+
+    Args:
+        text (str): raw text of the tree
+        position (int): position of the tree in the file
+        span (tuple): (start, end) byte offsets of the tree in the file
+        parse: function returning the tree of the text, None if there is
+            none (see PPCHYFormatReader.parse_block())
+
+    """
+
+    def __init__(self, text, position=None, span=None, parse=None):
+        self.text = text
+        self.position = position
+        self.span = span
+        self._parse = parse
+        self._tree = None
+        self._parsed = False
+        self._scanned = None
+
+    def __repr__(self):
+        return f"TreeHandle(position={self.position}, span={self.span})"
+
+    @property
+    def tree(self):
+        """
+        The IndexedCorpusTree of the text, parsed on first access
+        """
+        if not self._parsed:
+            if self._parse:
+                trees = self._parse(self.text)
+            else:
+                trees = [
+                    IndexedCorpusTree.fromstring(
+                        self.text, trim_id_tag=True, preprocess=True
+                    )
+                ]
+            self._tree = trees[0] if trees else None
+            self._parsed = True
+        return self._tree
+
+    def __getattr__(self, name):
+        # structure of the tree, e.g. label(), treepositions()
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.tree, name)
+
+    def __getitem__(self, index):
+        return self.tree[index]
+
+    def __len__(self):
+        return len(self.tree)
+
+    def __iter__(self):
+        return iter(self.tree)
+
+    def _scan(self):
+        """
+        Reads the corpus ID and the leaves of the tree from its text, the
+        way fromstring() would with trim_id_tag. Returns None if the text is
+        not a single well-formed tree or has escaped brackets, so it has to
+        be parsed instead.
+
+        Returns:
+            tuple: (corpus_id, leaves)
+        """
+        if self._scanned is None:
+            self._scanned = (None,) if "\\" in self.text else (self._scan_text(),)
+        return self._scanned[0]
+
+    def _scan_text(self):
+        leaves = []
+        top_label = None
+        top_size = 0  # number of children of the top node
+        last = None  # [label, children, leaves] of its last child node
+        depth = 0
+        label_next = closed = False
+        for token in self.text.replace("(", " ( ").replace(")", " ) ").split():
+            if closed:
+                return None
+            if token == "(":
+                if depth == 1:
+                    top_size += 1
+                    last = ["", 0, 0]
+                elif depth == 2:
+                    last[1] += 1
+                depth += 1
+                label_next = True
+            elif token == ")":
+                if depth == 0:
+                    return None
+                depth -= 1
+                closed = depth == 0
+                label_next = False
+            elif label_next:
+                if depth == 1:
+                    top_label = token
+                elif depth == 2:
+                    last[0] = token
+                label_next = False
+            elif depth == 0:
+                return None
+            else:
+                if depth == 1:
+                    top_size += 1
+                    last = None
+                elif depth == 2:
+                    last[1] += 1
+                    last[2] += 1
+                leaves.append(token)
+        if not closed:
+            return None
+        if top_label is None and top_size == 2 and last == ["ID", 1, 1]:
+            if len(leaves[-1]) >= 60:
+                # formatted over several lines by fromstring(), see there
+                return None
+            return f"(ID {leaves.pop()})".strip("()ID "), leaves
+        return None, leaves
+
+    @property
+    def corpus_id(self):
+        """
+        ID of the tree, None if it has no (ID ...) node. Read from the text
+        if possible.
+        """
+        scanned = self._scan()
+        if scanned is None:
+            return self.tree.corpus_id if self.tree is not None else None
+        return scanned[0]
+
+    @property
+    def corpus_id_num(self):
+        """
+        ID number of the tree, i.e. the part of its ID after the comma
+        """
+        corpus_id = self.corpus_id
+        if corpus_id is None or "," not in corpus_id:
+            return None
+        return corpus_id.split(",")[1]
+
+    def leaves(self):
+        """
+        Returns the leaves of the tree, without the leaf of its (ID ...)
+        node. Read from the text if it is not changed by the preprocessing.
+        """
+        scanned = None
+        if not self._parsed and (
+            PREPROCESS_LITERALS is not None
+            and not any(literal in self.text for literal in PREPROCESS_LITERALS)
+        ):
+            scanned = self._scan()
+        if scanned is None:
+            return self.tree.leaves()
+        return list(scanned[1])
+
+
+class TreeIndex:
+    """
+    Index of the trees in a .psd file, mapping tree ID numbers (the part of
+    the (ID ...) node after the comma, e.g. '156.3') to the byte offsets of
+    the trees in the file. Used for fetching single trees or ranges of trees
+    without reading the whole file.
+
+    The index is built over the memory mapped file and saved next to it as a
+    JSON sidecar file (<file>.psd.idx). It is rebuilt when the .psd file has
+    changed since the index was saved.
+
+    Args:
+        path (str): path to the .psd file
+        encoding (str): encoding of the .psd file
+        parse: function parsing the trees of handles(), see TreeHandle
+
+    Attributes:
+        spans (list): (start, end) byte offsets of every tree, in file order
+        ids (dict): tree ID number -> position of the tree in spans
+    """
+
+    VERSION = 1
+
+    TREE_START = re.compile(rb"^\(", re.M)
+    ID_NODE = re.compile(rb"\(ID ([^\s()]+)\)")
+
+    def __init__(self, path, encoding="utf-8", parse=None):
+        self.path = str(path)
+        self.index_path = self.path + ".idx"
+        self.encoding = encoding or "utf-8"
+        self.parse = parse
+        self.spans = []
+        self.ids = {}
+        if not self._load():
+            self._build()
+            self._save()
+
+    def __len__(self):
+        return len(self.spans)
+
+    def _stamp(self):
+        stat = os.stat(self.path)
+        return [self.VERSION, stat.st_size, stat.st_mtime_ns]
+
+    def _load(self):
+        try:
+            with open(self.index_path) as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if index.get("stamp") != self._stamp():
+            return False
+        self.spans = [tuple(span) for span in index["spans"]]
+        self.ids = index["ids"]
+        return True
+
+    def _save(self):
+        try:
+            with open(self.index_path, "w") as file:
+                json.dump(
+                    {"stamp": self._stamp(), "spans": self.spans, "ids": self.ids},
+                    file,
+                )
+        except OSError:
+            # index is kept in memory only, e.g. for read-only corpora
+            pass
+
+    def _build(self):
+        """
+        Finds the trees in the file, each starting at an unindented bracket
+        and ending before the next one, like in read_trees()
+        """
+        with open(self.path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                starts = [m.start() for m in self.TREE_START.finditer(mm)]
+                for start, end in zip(starts, starts[1:] + [len(mm)]):
+                    # trailing blank lines are not part of the tree
+                    while end > start and mm[end - 1 : end].isspace():
+                        end -= 1
+                    ids = self.ID_NODE.findall(mm, start, end)
+                    if ids and b"," in ids[-1]:
+                        id_num = ids[-1].split(b",", 1)[1].decode(self.encoding)
+                        self.ids[id_num] = len(self.spans)
+                    self.spans.append((start, end))
+
+    def find(self, id_num):
+        """
+        Returns the position of the tree with the given ID number in the
+        file, raises KeyError if there is no such tree
+        """
+        return self.ids[id_num]
+
+    def tree(self, id_num):
+        """
+        Returns the text of the tree with the given ID number
+        """
+        return self.trees(id_num, id_num)[0]
+
+    def trees(self, first_id_num, last_id_num):
+        """
+        Returns the texts of the trees from the tree with first_id_num to the
+        tree with last_id_num (inclusive), including trees without an ID
+        """
+        return [handle.text for handle in self.handles(first_id_num, last_id_num)]
+
+    def handles(self, first_id_num=None, last_id_num=None):
+        """
+        Returns TreeHandles of the trees from the tree with first_id_num to
+        the tree with last_id_num (inclusive), of all trees in the file if
+        no ID numbers are given. Only the text of the trees is read.
+        """
+        if first_id_num is None:
+            first, last = 0, len(self.spans) - 1
+        else:
+            first, last = self.find(first_id_num), self.find(last_id_num)
+            if first > last:
+                first, last = last, first
+        if last < first:
+            return []
+        with open(self.path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return [
+                    TreeHandle(
+                        mm[start:end].decode(self.encoding),
+                        position,
+                        (start, end),
+                        self.parse,
+                    )
+                    for position, (start, end) in enumerate(
+                        self.spans[first : last + 1], first
+                    )
+                ]
+
+
 class PPCHYFormatReader(CategorizedBracketParseCorpusReader):
     """24.03.20
 
@@ -338,6 +828,59 @@ class PPCHYFormatReader(CategorizedBracketParseCorpusReader):
     def __init__(self, *args, **kwargs):
         CategorizedBracketParseCorpusReader.__init__(self, *args, **kwargs)
 
+    def _read_block(self, stream):
+        # one tree per block, read with the bracket counting tree reader
+        # instead of the line by line regular expression matching of NLTK
+        tree = read_tree(stream)
+        return [tree] if tree else []
+
+    def blocks(self, fileids=None, categories=None):
+        """
+        Returns the raw text of the trees in the given files, unparsed, in
+        the same order as parsed_sents(). Used for handing trees of a single
+        file to worker processes.
+        """
+        return concat(
+            [
+                StreamBackedCorpusView(fileid, self._read_block, encoding=enc)
+                for fileid, enc in self.abspaths(
+                    self._resolve(fileids, categories), True
+                )
+            ]
+        )
+
+    def tree_index(self, fileid):
+        """
+        Returns the TreeIndex of a file in the corpus
+        """
+        return TreeIndex(self.abspath(fileid), self.encoding(fileid), self.parse_block)
+
+    def tree_handles(self, fileids=None, categories=None):
+        """
+        Returns TreeHandles of the trees in the given files, in the same
+        order as parsed_sents(). A tree is only parsed when its structure is
+        accessed, so reading IDs, counting trees or getting the text of the
+        trees does not parse them.
+        """
+        fileids = self._resolve(fileids, categories)
+        if fileids is None:
+            fileids = self.fileids()
+        elif isinstance(fileids, str):
+            fileids = [fileids]
+        return [
+            handle
+            for fileid in fileids
+            for handle in self.tree_index(fileid).handles()
+        ]
+
+    def parse_block(self, block):
+        """
+        Parses the raw text of a single tree from blocks(), returning a list
+        of at most one tree, as parsed_sents() skips empty parses
+        """
+        tree = self._parse(block)
+        return [tree] if tree else []
+
     def _parse(self, t):
         try:
             tree = IndexedCorpusTree.fromstring(
@@ -3,6 +3,9 @@ adapted by zdlpaul (paul.zodl@uni-konstanz.de)
 2025 
 """
 
+import re
+from functools import lru_cache
+
 cconj = {
     "un",
     "un'",
@@ -138,6 +141,20 @@ UD_map = {
     # "MEAS" : "ADJ", # for por, does not work
 }
 
+# UD tags of verb tags missing from UD_map, by their first two letters
+UD_prefix_map = {
+    "DO": "VERB",  # ATH. merkt sem sögn í bili
+    "DA": "VERB",
+    "RD": "VERB",
+    "RA": "VERB",
+    "BE": "AUX",
+    "BA": "AUX",
+    "HV": "AUX",
+    "HA": "AUX",
+    "MD": "AUX",
+    "MA": "AUX",
+}
+
 # This is used for the Icelandic tagger to get better results (I think?)
 # does not really make sense to use here then
 """ OTB_map = {
@@ -2534,6 +2551,95 @@ head_rules = {
     "MDPI": {"dir": "r", "rules": ["MDPI"]},
 }
 
+# index of a phrase label, e.g. the -1 in NP-SBJ-1, not part of the head rules
+LABEL_INDEX = re.compile(r"[=-]\d+")
+
+
+class HeadMatcher:
+    """
+    List of head rules compiled into a single regular expression, an
+    alternation of the rules in order of priority, so that every child label
+    is matched once instead of once for every rule.
+
+    Args:
+        rules (list): regular expressions for child labels, highest priority
+            first, each matched at the start of the label
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.ranks = {}  # group number -> priority of the rule
+        alternatives = []
+        group = 1
+        for rank, rule in enumerate(self.rules):
+            self.ranks[group] = rank
+            alternatives.append(f"({rule})")
+            group += 1 + re.compile(rule).groups
+        self.pattern = re.compile("|".join(alternatives))
+
+    def select(self, children):
+        """
+        Returns the child matched by the rule with the highest priority,
+        the first such child if there are more, skipping empty categories
+        (e.g. (NP-SBJ *pro*)). Returns None if no rule matches.
+        """
+        head = None
+        head_rank = len(self.rules)
+        for child in children:
+            try:
+                if child and child[0][0] == "*" and child.height() == 2:
+                    continue
+                match = self.pattern.match(child.label())
+            except AttributeError:
+                print(child)
+                raise
+            if match and self.ranks[match.lastindex] < head_rank:
+                head = child
+                head_rank = self.ranks[match.lastindex]
+                if head_rank == 0:
+                    break
+        return head
+
+
+class HeadRule:
+    """
+    Compiled head rules of a phrase label, see head_rules.
+    Besides the rules themselves, there are variants with extra rules for
+    clauses with auxiliary verbs, which are chosen by the number of verbs in
+    the clause (see Converter._select_head()).
+
+    Args:
+        dir (str): 'r' or 'l', the rules are reversed for 'l'
+        rules (list): regular expressions for child labels, in order
+    """
+
+    def __init__(self, dir, rules):
+        self.dir = dir
+        self.matcher = self._compile(rules)
+        self.one_verb = self._compile(rules[:4] + ["HV.*", "MD.*", "RD.*"] + rules[4:])
+        self.many_verbs = self._compile(
+            rules[:4] + ["IP-INF", "HV.*", "MD.*", "RD.*"] + rules[4:] + ["BE.*"]
+        )
+
+    def _compile(self, rules):
+        if self.dir == "l":
+            rules = rules[::-1]
+        return HeadMatcher(rules)
+
+
+head_matchers = {tag: HeadRule(**rule) for tag, rule in head_rules.items()}
+
+# default rule, first from left
+default_head_rule = HeadRule("r", [".*"])
+
+
+@lru_cache(maxsize=None)
+def get_head_rule(label):
+    """
+    Returns the HeadRule of a phrase label, without its index
+    """
+    return head_matchers.get(LABEL_INDEX.sub("", label), default_head_rule)
+
 relation_NP = {
     None: "obl",
     "LFD": "obl",
@@ -7,170 +7,165 @@ import string
 import re
 import requests
 import json
+from functools import lru_cache
 
 from lib.rules import relation_NP, relation_IP, relation_CP, abbr_map
 from lib.reader import IndexedCorpusTree
 
 
+def _starts(*prefixes):
+    """
+    Returns a condition for tags starting with any of the prefixes
+    """
+    return lambda tag: tag.startswith(prefixes)
+
+
+def _has_index(func):
+    return bool(func) and "=" in func
+
+
+# Rules for determining the UD relation of a modifier from its tag and
+# function and the tag and function of its head, tried in order, where the
+# first matching rule gives the relation. A rule is
+#     (mod_tag, mod_func, head_tag, head_func, relation)
+# where each condition is None (anything), a set of values or a function of
+# the value, and the relation is a name or a function of (mod_func, head_func)
+relation_rules = [
+    # -ADV, -CMP, -PRN, -SBJ, -OB1, -OB2, -OB3, -PRD, -POS, -COM, -ADT, -TMP, -MSR
+    ({"NP", "NX", "WNX"}, None, None, None, lambda mf, hf: relation_NP.get(mf, "dep")),
+    ({"WNP"}, None, None, None, "obj"),
+    # seinna no. í nafnlið fær 'conj' og er háð fyrra no.
+    ({"NS", "N", "NPRS"}, None, {"NP", "NX", "QTP", "ADJP", "CONJP", "NPR"}, None, "conj"),
+    (None, None, {"ADJP"}, None, "amod"),
+    ({"NPR"}, None, {"CONJP"}, None, "conj"),
+    ({"ES"}, None, None, None, "expl"),  # expletive
+    ({"PRO$"}, None, None, None, "det:poss"),
+    ({"PRO", "WPRO"}, None, None, None, "nmod"),
+    ({"Q"}, None, {"D"}, None, "compound"),
+    (
+        {"D", "WD", "ONE", "ONES", "OTHER", "OTHERS", "SUCH", "Q", "QR", "QS", "WQP"},
+        None,
+        None,
+        None,
+        "det",
+    ),
+    # -SPR (secondary predicate)
+    (_starts("ADJ", "WADJ"), None, None, None, "amod"),
+    # -BY, -PRN
+    # NP sem er haus PP fær obl nominal  #TODO: haus CP-ADV (sem er PP) á að vera merktur advcl
+    ({"PP", "WPP", "PX"}, None, None, None, "obl"),
+    ({"P"}, None, None, None, "case"),
+    # FP = focus particles  #QP = quantifier phrase - ATH.
+    (
+        lambda tag: tag.startswith("ADV")
+        or tag in {"NEG", "FP", "QP", "ALSO", "WADV", "WADVP"},
+        None,
+        None,
+        None,
+        "advmod",
+    ),
+    # ath. virkar fyrir eitt dæmi, of greedy?
+    ({"NS"}, None, {"ADVP"}, {"TMP"}, "conj"),
+    ({"RP", "RPX"}, None, None, None, "compound:prt"),
+    ({"IP"}, {"SUB"}, {"CP"}, {"FRL"}, "acl:relcl"),
+    ({"IP", "VP"}, None, None, None, lambda mf, hf: relation_IP.get(mf, "dep")),
+    (_starts("VB"), None, {"CP"}, None, "ccomp"),
+    (None, None, {"IP"}, {"INF-PRP"}, "advcl"),
+    ({"VAN"}, None, {"NP"}, None, "amod"),
+    (lambda tag: tag in {"VAN", "DAN"} or tag.startswith("DO"), None, None, None, "ccomp/xcomp"),
+    ({"VAN", "DAN", "HAN", "BAN", "RAN"}, None, None, None, "aux"),  # RAN vantaði?
+    # ath. VBN getur verið rót
+    ({"VBN", "DON", "HVN", "RDN"}, None, None, _has_index, "conj"),
+    ({"VBN", "DON", "HVN", "RDN"}, None, None, None, "dep"),
+    (_starts("DO", "HV", "RD", "MD"), None, None, None, "aux"),
+    (lambda tag: tag.startswith("BE") or tag == "BAN", None, None, None, "cop"),
+    ({"VAG"}, None, None, None, "amod"),
+    ({"RRC"}, None, None, None, "acl:relcl"),
+    ({"CONJ"}, None, None, None, "cc"),
+    # N: tvö N í einum NP tengd með CONJ
+    ({"CONJP", "N"}, None, {"NP", "N", "PP"}, None, "conj"),
+    ({"CONJP"}, None, {"IP"}, None, lambda mf, hf: relation_IP.get(hf, "dep")),
+    ({"CONJP"}, None, None, None, "conj"),
+    ({"CP"}, {"REL"}, {"ADVP"}, None, "advcl"),
+    ({"CP"}, None, None, None, lambda mf, hf: relation_CP.get(mf, "dep")),
+    # infinitival marker with marker relation
+    ({"C", "CP", "TO", "WQ"}, None, None, None, "mark"),
+    ({"NUM", "NUMP"}, None, None, None, "nummod"),
+    ({"FRAG"}, None, None, None, "xcomp"),
+    (lambda tag: tag in string.punctuation or tag == "LB", None, None, None, "punct"),
+    ({"INTJ", "INTJP"}, None, None, None, "discourse"),
+    (None, None, {"INTJP"}, None, "discourse"),
+    ({"FOREIGN", "FW", "ENGLISH", "LATIN"}, None, None, None, "flat:foreign"),
+    (None, None, {"FOREIGN", "FW", "ENGLISH", "LATIN"}, None, "flat:foreign"),
+    # XXX = annotator unsure of parse, LS = list marker
+    # unspecified dependency
+    ({"XXX", "XP", "X", "QTP", "REP", "FS", "LS", "META", "REF"}, None, None, None, "dep"),
+    (None, None, {"META", "CODE", "REF", "FRAG"}, None, "dep"),
+]
+
+
+def _holds(condition, value):
+    if condition is None:
+        return True
+    if callable(condition):
+        return condition(value)
+    return value in condition
+
+
+@lru_cache(maxsize=None)
 def determine_relations(mod_tag, mod_func, head_tag, head_func):
+    """
+    Returns the UD relation of a modifier to its head, by the first matching
+    rule in relation_rules, 'dep' if none matches
+    """
+    for mod, mod_f, head, head_f, relation in relation_rules:
+        if (
+            _holds(mod, mod_tag)
+            and _holds(mod_f, mod_func)
+            and _holds(head, head_tag)
+            and _holds(head_f, head_func)
+        ):
+            return relation(mod_func, head_func) if callable(relation) else relation
 
-    if mod_tag in ["NP", "NX", "WNX"]:
-        # -ADV, -CMP, -PRN, -SBJ, -OB1, -OB2, -OB3, -PRD, -POS, -COM, -ADT, -TMP, -MSR
-        return relation_NP.get(mod_func, "dep")
-    elif mod_tag == "WNP":
-        return "obj"
-    elif mod_tag in ["NS", "N", "NPRS"] and head_tag in [
-        "NP",
-        "NX",
-        "QTP",
-        "ADJP",
-        "CONJP",
-        "NPR",
-    ]:  # seinna no. í nafnlið fær 'conj' og er háð fyrra no.
-        return "conj"
-    # elif mod_tag in ["ADJ", "ADJR", "ADJS", "ADJP", "ADJP-PRD", "ADJP-SPR"] and head_tag in ["N", "NP"]:
-        # return "nmod"  does not work for some reason..
-    elif head_tag == "ADJP":
-        return "amod"
-    elif mod_tag == "NPR" and head_tag == "CONJP":
-        return "conj"
-    elif mod_tag == "ES":
-        return "expl"  # expletive
-    elif mod_tag == "PRO$":
-        return "det:poss"
-    elif mod_tag in ["PRO", "WPRO"]:
-        return "nmod"
-    elif mod_tag == "Q" and head_tag == "D":
-        print(mod_tag, head_tag)
-        return "compound"
-    elif mod_tag in ["D", "WD", "ONE", "ONES", "OTHER", "OTHERS", "SUCH", "Q", "QR", "QS", "WQP"]:
-        return "det"
-    elif (
-        mod_tag[:3] == "ADJ"
-        or mod_tag[:4] == "WADJ"
-    ):
-        # -SPR (secondary predicate)
-        return "amod"
-    elif mod_tag in ["PP", "WPP", "PX"]:
-        # -BY, -PRN
-        return "obl"  # NP sem er haus PP fær obl nominal  #TODO: haus CP-ADV (sem er PP) á að vera merktur advcl
-    elif mod_tag == "P":
-        return "case"
-    # elif mod_tag == "MEAS": for por? 
-        # return "compound"
-    elif mod_tag[:3] == "ADV" or mod_tag in [
-        "NEG",
-        "FP",
-        "QP",
-        "ALSO",
-        "WADV",
-        "WADVP",
-    ]:  # FP = focus particles  #QP = quantifier phrase - ATH.
-        """
-        if head_func == 'QUE' or head_tag == 'WNP':
-            # Ætti að grípa spurnarorð í spurnarsetningum, sem eru mark skv. greiningu HJ - TODO er þetta rétt?
-            return 'mark'
-        else:
-            # -DIR, -LOC, -TP
-            return 'advmod'
-        """
-        return "advmod"
-    elif (
-        mod_tag == "NS" and head_tag == "ADVP" and head_func == "TMP"
-    ):  # ath. virkar fyrir eitt dæmi, of greedy?
-        return "conj"
-    elif mod_tag in ["RP", "RPX"]:
-        return "compound:prt"
-    elif (
-        mod_tag == "IP"
-        and mod_func == "SUB"
-        and head_tag == "CP"
-        and head_func == "FRL"
-    ):
-        return "acl:relcl"
-    elif mod_tag in ["IP", "VP"]:
-        return relation_IP.get(mod_func, "dep")
-    elif mod_tag[:2] == "VB" and head_tag == "CP":
-        return "ccomp"
-    elif head_tag == "IP" and head_func == "INF-PRP":
-        return "advcl"
-    elif head_tag == "NP" and mod_tag == "VAN":
-        return "amod"
-    elif mod_tag in ["VAN", "DAN"] or mod_tag[:2] == "DO":
-        return "ccomp/xcomp"
-    elif mod_tag in ["VAN", "DAN", "HAN", "BAN", "RAN"]:  # RAN vantaði?
-        return "aux"
-    elif mod_tag in ["VBN", "DON", "HVN", "RDN"]:  # ath. VBN getur verið rót
-        if head_func and "=" in head_func:
-            return "conj"
-        else:
-            return "dep"
-    # elif mod_tag[:2] in ['VB', 'DO', 'HV', 'RD', 'MD']: #todo
-    elif mod_tag[:2] in ["DO", "HV", "RD", "MD"]:  # todo
-        return "aux"
-        # return 'verb' # testing dropping aux in output
-    elif mod_tag[:2] == "BE" or mod_tag == "BAN":
-        return "cop"
-    elif mod_tag == "VAG":
-        return "amod"
-    elif mod_tag == "RRC":
-        return "acl:relcl"
-    elif mod_tag == "CONJ":
-        return "cc"
-    elif mod_tag in ["CONJP", "N"] and head_tag in [
-        "NP",
-        "N",
-        "PP",
-    ]:  # N: tvö N í einum NP tengd með CONJ
-        return "conj"
-    elif mod_tag == "CONJP" and head_tag == "IP":
-        return relation_IP.get(head_func, "dep")
-    elif mod_tag == "CONJP":
-        return "conj"
-    elif mod_tag == "CP" and mod_func == "REL" and head_tag == "ADVP":
-        return "advcl"
-    elif mod_tag == "CP":
-        return relation_CP.get(mod_func, "dep")
-    elif mod_tag in ["C", "CP", "TO", "WQ"]:  # infinitival marker with marker relation
-        return "mark"
-    elif mod_tag in ["NUM", "NUMP"]:
-        return "nummod"
-    elif mod_tag == "FRAG":
-        return "xcomp"
-    elif mod_tag in string.punctuation or mod_tag == "LB":
-        return "punct"
-    elif mod_tag in ["INTJ", "INTJP"] or head_tag == "INTJP":
-        return "discourse"
-    elif mod_tag in ["FOREIGN", "FW", "ENGLISH", "LATIN"] or head_tag in [
-        "FOREIGN",
-        "FW",
-        "ENGLISH",
-        "LATIN",
-    ]:
-        return "flat:foreign"
-    elif mod_tag in [
-        "XXX",
-        "XP",
-        "X",
-        "QTP",
-        "REP",
-        "FS",
-        "LS",
-        "META",
-        "REF",
-    ]:  # XXX = annotator unsure of parse, LS = list marker
-        return "dep"  # unspecified dependency
-    elif head_tag in ["META", "CODE", "REF", "FRAG"]:
-        return "dep"
-    elif mod_tag in ["N", "NS", "NPR", "NPRS"]:
-        # return 'rel'
-        return "dep"
-    elif head_tag == "IP" and head_func == "SMC":
-        return "dep"
-    
     return "dep"
 
 
+# parts of phrase labels left out when determining relations
+LABEL_TTT = re.compile("-TTT")
+LABEL_INDEX = re.compile(r"[=-]\d+")
+LABEL_X = re.compile("=XXX|=X")
+LABEL_PLUS = re.compile(r"\w+\+")
+
+
+def split_label(tag):
+    """
+    Splits a phrase label into its tag and function, e.g. 'NP-SBJ-1' into
+    ('NP', 'SBJ'), leaving out indices and the first part of '+' tags.
+    The function is None if there is none.
+    """
+    tag = LABEL_TTT.sub("", tag)
+    tag = LABEL_INDEX.sub("", tag)
+    tag = LABEL_X.sub("", tag)
+    if "+" in tag:
+        tag = LABEL_PLUS.sub("", tag)
+    if "-" in tag:
+        # todo, handle more than one function label
+        tag, func = tag.split("-", 1)
+        return tag, func
+    return tag, None
+
+
+@lru_cache(maxsize=None)
+def resolve_relation(mod_label, head_label):
+    """
+    Returns the UD relation between phrase labels of a modifier and its head,
+    memoized, as the same pairs of labels come up over and over
+    """
+    mod_tag, mod_func = split_label(mod_label)
+    head_tag, head_func = split_label(head_label)
+    return determine_relations(mod_tag, mod_func, head_tag, head_func)
+
+
 def decode_escaped(string, lemma=False):
     """
     Fixes various punctuations (-, /, ') that are escaped in corpus data
@@ -200,6 +195,7 @@ def fix_IcePaHC_tree_errors(tree):
     if not tree.corpus_id:
         return tree
     fileid = tree.corpus_id.split(",")[0]
+    children = len(tree)
     if fileid == "1150.HOMILIUBOK.REL-SER":
         if tree.corpus_id_num in {".691", ".697", ".1040", ".1044", ".1572"}:
             tree.append(IndexedCorpusTree.fromstring("(. ?-?)"))
@@ -211,12 +207,16 @@ def fix_IcePaHC_tree_errors(tree):
             tree.append(IndexedCorpusTree.fromstring('(" "-")'))
         elif tree.corpus_id_num == ".1680":
             tree.append(IndexedCorpusTree.fromstring("(. .-.)"))
+    if len(tree) != children:
+        tree.invalidate()
     return tree
 
 
 def tagged_corpus(corpus):
     """
-    Gets tagged data for corpus
+    Gets tagged data for corpus, an iterable of trees or TreeHandles (see
+    PPCHYFormatReader.tree_handles()), of which only the IDs and leaves are
+    used
     """
     text = ""
     IDs = []
@@ -231,9 +231,9 @@ def tagged_corpus(corpus):
                 "",
                 " ".join(
                     [
-                        tree[i].split("-")[0]
-                        for i in tree.treepositions()
-                        if isinstance(tree[i], str) and "-" in tree[i]
+                        leaf.split("-")[0]
+                        for leaf in tree.leaves()
+                        if "-" in leaf
                     ]
                 ),
             )
@@ -0,0 +1,70 @@
+"""
+Buffered writing of the CoNLL-U output of the conversion.
+
+The CoNLL-U of a sentence is put together from the word lines of its
+dependency graph in one join, and the sentences are collected in a buffer
+which is written to the output file in bulk once it holds flush_size
+characters.
+
+adapted by zdlpaul (paul.zodl@uni-konstanz.de)
+2025
+"""
+
+# number of characters buffered before they are written to the output file
+FLUSH_SIZE = 1 << 18
+
+
+def sentence_lines(dep):
+    """
+    Yields the CoNLL-U of a finished sentence following its sent_id line,
+    in pieces: the original treebank ID(s), the sentence text and the word
+    lines, ending with the blank line after the sentence
+    """
+    yield str(dep.original_ID_plain_text())
+    yield "\n"
+    yield str(dep.plain_text())
+    yield "\n"
+    yield from dep.conllU_lines()
+    yield "\n"
+
+
+class ConllUWriter:
+    """
+    Writes CoNLL-U sentences (see sentence_lines()) to a file through a
+    buffer, which is flushed to the file when it holds flush_size
+    characters, when flush() is called and at the end of a with block.
+
+    Args:
+        file: file object the output is written to
+        flush_size (int): number of characters buffered, FLUSH_SIZE if
+            None, 0 to write all text at once (e.g. to stdout, between
+            prompts)
+    """
+
+    def __init__(self, file, flush_size=None):
+        self.file = file
+        self.flush_size = FLUSH_SIZE if flush_size is None else flush_size
+        self.buffer = []
+        self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def write(self, text):
+        """
+        Writes text, e.g. a sent_id line or the cached CoNLL-U of a sentence
+        """
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.buffer = []
+            self.size = 0
+        self.file.flush()
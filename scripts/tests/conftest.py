@@ -0,0 +1,18 @@
+import os
+import sys
+
+import nltk
+import pytest
+
+# the scripts import their modules as lib.*, relative to the scripts directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def corpus_dir(tmp_path, monkeypatch):
+    """
+    Directory for .psd files of a test corpus, readable by nltk's corpus
+    readers
+    """
+    monkeypatch.setattr(nltk.data, "path", nltk.data.path + [str(tmp_path)])
+    return tmp_path
@@ -0,0 +1,253 @@
+import io
+import os
+from functools import partial
+
+import pytest
+
+import convert
+from lib import depender
+from lib import cache as cache_module
+from lib.cache import BuildCache, ParsedTreeCache, TreeCache
+from lib.reader import PPCHYFormatReader, read_trees
+
+CORPUS_FILE = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "..",
+    "corpora",
+    "PPCHY",
+    "1478w-letter-regensburg.psd",
+)
+
+
+@pytest.fixture
+def psd():
+    """
+    Text of a PPCHY file
+    """
+    with open(CORPUS_FILE, encoding="utf-8") as file:
+        return file.read()
+
+
+@pytest.fixture
+def conversions(monkeypatch):
+    """
+    List of the trees converted by convert_tree()
+    """
+    converted = []
+    convert_tree = convert.convert_tree
+
+    def counting(c, tree, num):
+        converted.append(tree.corpus_id_num)
+        return convert_tree(c, tree, num)
+
+    monkeypatch.setattr(convert, "convert_tree", counting)
+    return converted
+
+
+@pytest.fixture
+def build(tmp_path):
+    """
+    Input and output file of a build, recorded in a saved build cache, and
+    the path of the cache
+    """
+    input_path = tmp_path / "1947e-test.psd"
+    input_path.write_text("( (IP-MAT (VBF kum) (. !))\n  (ID 1947E-TEST,1.1))\n")
+    output_path = tmp_path / "1947e-test.conllu"
+    output_path.write_text("# sent_id = 1947e-test_1\n")
+    path = str(tmp_path / "build.json")
+    cache = BuildCache(path)
+    cache.put(str(output_path), cache.key(str(input_path), "corpus"), 1)
+    cache.save()
+    return str(input_path), str(output_path), path
+
+
+def test_build_cache_hit(build):
+    input_path, output_path, path = build
+    cache = BuildCache(path)
+    assert cache.get(output_path, cache.key(input_path, "corpus")) == 1
+    assert cache.reused == 1
+
+
+def test_build_cache_input_changed(build):
+    input_path, output_path, path = build
+    with open(input_path, "a") as file:
+        file.write("\n( (IP-MAT (VBF gey) (. .))\n  (ID 1947E-TEST,1.2))\n")
+    cache = BuildCache(path)
+    assert cache.get(output_path, cache.key(input_path, "corpus")) is None
+    assert cache.reused == 0
+
+
+def test_build_cache_code_changed(build, monkeypatch):
+    input_path, output_path, path = build
+    monkeypatch.setattr(cache_module, "code_fingerprint", lambda: "changed")
+    cache = BuildCache(path)
+    assert cache.get(output_path, cache.key(input_path, "corpus")) is None
+
+
+def test_build_cache_output_edited(build):
+    input_path, output_path, path = build
+    with open(output_path, "a") as file:
+        file.write("1\tkum\n")
+    cache = BuildCache(path)
+    assert cache.get(output_path, cache.key(input_path, "corpus")) is None
+
+
+def test_build_cache_output_deleted(build):
+    input_path, output_path, path = build
+    os.remove(output_path)
+    cache = BuildCache(path)
+    assert cache.get(output_path, cache.key(input_path, "corpus")) is None
+
+
+def test_build_cache_modes(build):
+    input_path, output_path, path = build
+    cache = BuildCache(path)
+    assert cache.key(input_path, "N") != cache.key(input_path, "corpus")
+    assert cache.get(output_path, cache.key(input_path, "N")) is None
+    cache.put(output_path, cache.key(input_path, "N"), 1)
+    assert cache.get(output_path, cache.key(input_path, "corpus")) is None
+    assert cache.get(output_path, cache.key(input_path, "N")) == 1
+
+
+def file_sentences(corpus_dir, text, cache=None):
+    """
+    Returns the CoNLL-U of the sentences of a .psd file with the given text
+    """
+    (corpus_dir / "1478w-test.psd").write_text(text, encoding="utf-8")
+    corpus = PPCHYFormatReader(str(corpus_dir), r".*\.psd", cat_pattern=r".*(14).*")
+    blocks = corpus.blocks("1478w-test.psd")
+    return [
+        body
+        for body, n in convert.file_sentences(
+            depender.Converter(), corpus, blocks, cache=cache
+        )
+    ]
+
+
+def test_tree_cache(corpus_dir, tmp_path, psd, conversions):
+    path = str(tmp_path / "trees.sqlite")
+    cache = TreeCache(path)
+    expected = file_sentences(corpus_dir, psd, cache)
+    cache.close()
+    trees = len(list(read_trees(io.StringIO(psd))))
+    assert len(conversions) == trees
+    assert expected == file_sentences(corpus_dir, psd)
+
+    # a hit for every tree and sentence when run again
+    del conversions[:]
+    cache = TreeCache(path)
+    assert file_sentences(corpus_dir, psd, cache) == expected
+    cache.close()
+    assert conversions == []
+
+    # a miss for the edited tree, which is converted with its sentence
+    first, rest = psd.split("\n", 1)
+    edited = first + "\n" + rest.replace("(N ", "(N xx", 1)
+    assert edited != psd
+    cache = TreeCache(path)
+    sentences = file_sentences(corpus_dir, edited, cache)
+    cache.close()
+    assert 0 < len(conversions) < trees
+    assert sentences != expected
+    assert sentences == file_sentences(corpus_dir, edited)
+
+
+def test_tree_cache_batches(tmp_path):
+    path = str(tmp_path / "trees.sqlite")
+    cache = TreeCache(path)
+    for num in range(TreeCache.BATCH_SIZE + 10):
+        cache.put_ends(str(num), num % 2)
+    # written in a batch, visible to other connections
+    other = TreeCache(path)
+    assert other.ends("1") is True
+    assert other.ends(str(TreeCache.BATCH_SIZE + 5)) is None
+    # pending rows are read from memory
+    assert cache.ends(str(TreeCache.BATCH_SIZE + 5)) is True
+    cache.close()
+    assert other.ends(str(TreeCache.BATCH_SIZE + 5)) is True
+    other.close()
+
+
+def parsed_trees(path, directory, parsed_texts):
+    """
+    Returns the parsed tree cache of a .psd file and the trees of the file,
+    read through it. Texts parsed because they are not in the cache are
+    added to parsed_texts.
+    """
+
+    def parse(text):
+        parsed_texts.append(text)
+        return convert.parse_psd_tree(text)
+
+    cache = ParsedTreeCache(
+        path, parse, "N", partial(convert.psd_blocks, path), directory
+    )
+    trees = [cache.parse_block(block) for block in convert.psd_blocks(path)]
+    cache.save()
+    return cache, trees
+
+
+def test_parsed_tree_cache(tmp_path, psd):
+    path = str(tmp_path / "1478w-test.psd")
+    directory = str(tmp_path / "parsed")
+    with open(path, "w") as file:
+        file.write(psd)
+    blocks = list(convert.psd_blocks(path))
+    parsed_texts = []
+    cache, expected = parsed_trees(path, directory, parsed_texts)
+    assert parsed_texts == blocks
+    assert cache.reused == 0
+
+    # a hit for every tree when run again, with the same trees
+    del parsed_texts[:]
+    cache, trees = parsed_trees(path, directory, parsed_texts)
+    assert parsed_texts == []
+    assert cache.reused == len(blocks)
+    assert [str(tree) for (tree,) in trees] == [str(tree) for (tree,) in expected]
+    assert [tree.corpus_id for (tree,) in trees] == [
+        tree.corpus_id for (tree,) in expected
+    ]
+
+    # a miss for the edited tree, the old text is dropped from the cache
+    edited = blocks[3].replace("(N ", "(N xx", 1)
+    assert edited != blocks[3]
+    with open(path, "w") as file:
+        file.write(psd.replace(blocks[3], edited))
+    cache, trees = parsed_trees(path, directory, parsed_texts)
+    assert parsed_texts == [edited]
+    assert cache.reused == len(blocks) - 1
+    del parsed_texts[:]
+    cache, trees = parsed_trees(path, directory, parsed_texts)
+    assert parsed_texts == []
+    assert blocks[3] not in cache.texts
+    assert set(cache.texts) == set(blocks[:3] + [edited] + blocks[4:])
+
+
+def test_parsed_tree_cache_jobs(corpus_dir, monkeypatch):
+    # the first trees of a larger file, split into chunks for three workers
+    source = CORPUS_FILE.replace("1478w-letter-regensburg", "1910e-grine-felder")
+    with open(source, encoding="utf-8") as file:
+        texts = list(read_trees(file))[:600]
+    (corpus_dir / "corpora" / "TEST").mkdir(parents=True)
+    path = corpus_dir / "corpora" / "TEST" / "1910e-test.psd"
+    path.write_text("\n".join(texts), encoding="utf-8")
+    # caches of the test, also used by the (forked) worker processes
+    monkeypatch.setattr(
+        convert, "TreeCache", partial(TreeCache, str(corpus_dir / "trees.sqlite"))
+    )
+    monkeypatch.setattr(
+        convert,
+        "ParsedTreeCache",
+        partial(ParsedTreeCache, directory=str(corpus_dir / "parsed")),
+    )
+    corpus = convert.load_corpus("TEST")
+    output = io.StringIO()
+    sents = convert.convert_file_parallel(
+        corpus, str(corpus_dir), "TEST", "1910e-test.psd", 3, output, use_cache=True
+    )
+    assert sents > 0
+
+    cached = convert.parsed_tree_cache(corpus, "1910e-test.psd")
+    assert set(cached.texts) == set(corpus.blocks("1910e-test.psd"))
+    assert len(cached.texts) == len(texts)
@@ -0,0 +1,116 @@
+import io
+import os
+
+import pytest
+from nltk import Tree
+from nltk.data import SeekableUnicodeStreamReader
+
+from lib.reader import IndexedCorpusTree, PPCHYFormatReader, read_tree, read_trees
+
+# the first tree is missing its closing brackets, it ends where the second
+# tree begins
+UNBALANCED = (
+    "( (IP-MAT (NP-SBJ (PRO er))\n"
+    "  (VBF geyt)\n"
+    "\n"
+    "( (IP-MAT (NP-SBJ (PRO zi))\n"
+    "          (VBF shlofn)\n"
+    "          (. .))\n"
+    "  (ID 1947E-TEST,2.2))\n"
+    "\n"
+    "( (IP-MAT (VBF kum) (. !))\n"
+    "  (ID 1947E-TEST,3.3))\n"
+)
+
+
+def test_read_trees_unbalanced():
+    trees = list(read_trees(io.StringIO(UNBALANCED)))
+    assert len(trees) == 3
+    assert trees[0].startswith("( (IP-MAT (NP-SBJ (PRO er))")
+    assert trees[1] == (
+        "( (IP-MAT (NP-SBJ (PRO zi))\n"
+        "          (VBF shlofn)\n"
+        "          (. .))\n"
+        "  (ID 1947E-TEST,2.2))\n"
+    )
+
+
+def test_read_tree_unbalanced():
+    stream = SeekableUnicodeStreamReader(io.BytesIO(UNBALANCED.encode()), "utf-8")
+    trees = list(iter(lambda: read_tree(stream), ""))
+    assert trees == list(read_trees(io.StringIO(UNBALANCED)))
+
+
+def test_blocks_unbalanced(corpus_dir):
+    (corpus_dir / "1947e-test.psd").write_text(UNBALANCED, encoding="utf-8")
+    corpus = PPCHYFormatReader(str(corpus_dir), r".*\.psd", cat_pattern=r".*(19).*")
+    blocks = list(corpus.blocks())
+    assert blocks == list(read_trees(io.StringIO(UNBALANCED)))
+    trees = corpus.parsed_sents()
+    assert [tree.corpus_id_num for tree in trees[1:]] == ["2.2", "3.3"]
+
+
+def test_aggregates_invalidate():
+    tree = IndexedCorpusTree.fromstring("( (IP-MAT (NP (N x)) (VBF y) (CODE z)))")
+    assert tree.aggregates() == (5, 3, 1)
+    tree[0].append(IndexedCorpusTree.fromstring("(VB w)"))
+    # cached until the tree is invalidated
+    assert tree.aggregates() == (5, 3, 1)
+    tree.invalidate()
+    assert tree.aggregates() == (5, 4, 2)
+    assert tree[0].aggregates() == (4, 4, 2)
+
+
+def test_remove_nodes_invalidates():
+    tree = IndexedCorpusTree.fromstring("( (IP-MAT (NP (N x)) (VBF y) (CODE z)))")
+    assert tree.num_leaves() == 3
+    tree[0].remove_nodes(tags=["CODE"])
+    assert tree[0].num_leaves() == 2
+    assert tree[0].remove_nodes(tags=["CODE"]).pruned["tags"] == 1
+
+
+def structure(tree):
+    """
+    Label and children of a tree as nested tuples, for comparing trees of
+    different classes
+    """
+    if not isinstance(tree, Tree):
+        return tree
+    return (tree.label(), tuple(structure(child) for child in tree))
+
+
+CORPUS_FILE = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "..",
+    "corpora",
+    "PPCHY",
+    "1478w-letter-regensburg.psd",
+)
+
+
+def test_parse_brackets_like_nltk():
+    with open(CORPUS_FILE, encoding="utf-8") as file:
+        texts = list(read_trees(file))
+    assert texts
+    for text in texts:
+        tree = IndexedCorpusTree.parse_brackets(text)
+        assert isinstance(tree, IndexedCorpusTree)
+        assert structure(tree) == structure(Tree.fromstring(text))
+
+
+def test_parse_brackets_escaped():
+    # text with a backslash is read by nltk
+    text = r"( (NP (N a\(b) (N c)))"
+    tree = IndexedCorpusTree.parse_brackets(text)
+    assert isinstance(tree, IndexedCorpusTree)
+    assert structure(tree) == structure(Tree.fromstring(text))
+    assert tree[0][0][0] == r"a\(b"
+
+
+@pytest.mark.parametrize("text", ["(A b) (C d)", "(A (B c)", "(A (B c)))", ")(", "A"])
+def test_parse_brackets_errors(text):
+    with pytest.raises(ValueError):
+        Tree.fromstring(text)
+    with pytest.raises(ValueError):
+        IndexedCorpusTree.parse_brackets(text)
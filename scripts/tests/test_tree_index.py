@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from lib.reader import TreeIndex
+
+PSD = (
+    "( (IP-MAT (NP-SBJ (PRO er)) (VBF geyt) (. .))\n"
+    "  (ID 1947E-TEST,1.1))\n"
+    "\n"
+    "( (IP-MAT (NP-SBJ (PRO zi)) (VBF shloft) (. .))\n"
+    "  (ID 1947E-TEST,1.2))\n"
+)
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """
+    List of the paths TreeIndex._build() is called for
+    """
+    built = []
+    build = TreeIndex._build
+
+    def counting(self):
+        built.append(self.path)
+        build(self)
+
+    monkeypatch.setattr(TreeIndex, "_build", counting)
+    return built
+
+
+@pytest.fixture
+def psd_path(tmp_path):
+    path = tmp_path / "1947e-test.psd"
+    path.write_text(PSD, encoding="utf-8")
+    return str(path)
+
+
+def test_index_saved(psd_path, builds):
+    index = TreeIndex(psd_path)
+    assert os.path.exists(psd_path + ".idx")
+    assert builds == [psd_path]
+    assert index.tree("1.2").startswith("( (IP-MAT (NP-SBJ (PRO zi))")
+
+    # loaded from the sidecar file while the .psd file is unchanged
+    index = TreeIndex(psd_path)
+    assert builds == [psd_path]
+    assert len(index) == 2
+    assert index.tree("1.1").startswith("( (IP-MAT (NP-SBJ (PRO er))")
+
+
+def test_index_rebuilt_on_mtime(psd_path, builds):
+    TreeIndex(psd_path)
+    # same size, different tree
+    with open(psd_path, "w", encoding="utf-8") as file:
+        file.write(PSD.replace("(PRO zi)", "(PRO du)"))
+    stat = os.stat(psd_path)
+    os.utime(psd_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    index = TreeIndex(psd_path)
+    assert len(builds) == 2
+    assert index.tree("1.2").startswith("( (IP-MAT (NP-SBJ (PRO du))")
+
+
+def test_index_rebuilt_on_size(psd_path, builds):
+    TreeIndex(psd_path)
+    stat = os.stat(psd_path)
+    with open(psd_path, "a", encoding="utf-8") as file:
+        file.write("\n( (IP-MAT (VBF kum) (. !))\n  (ID 1947E-TEST,1.3))\n")
+    # same modification time, different size
+    os.utime(psd_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    index = TreeIndex(psd_path)
+    assert len(builds) == 2
+    assert len(index) == 3
+    assert index.tree("1.3").startswith("( (IP-MAT (VBF kum)")